@@ -1,9 +1,18 @@
 # Course:      CS261 - Data Structures
 # Assignment:  6
-# Description: Provided data structures necessary to complete the assignment.
-#              Please look through this file carefully to see what methods
-#              are available and how they're implemented.
-#              Don't modify the contents of this file.
+# Description: The support library shared by the hash maps: the DynamicArray, LinkedList and SLNode the
+#              assignment provided, the hash functions (with their batch and keyed forms), the capacity
+#              policies, and the HashMapStats the maps record their operations in.
+
+
+from bisect import bisect_left, bisect_right
+from hashlib import blake2b
+
+# NumPy is optional, it is only used to hash whole lists of keys at once in hash_many
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 # -------------- Used by both HashMaps (SC & OA)  -------------- #
@@ -78,6 +87,83 @@ class DynamicArray:
         return len(self._data)
 
 
+def to_list(items) -> list:
+    """
+    Returns a list of the elements of a DynamicArray (which can't be iterated over) or of any other iterable
+    """
+    if isinstance(items, DynamicArray):
+        return [items[index] for index in range(items.length())]
+    return list(items)
+
+
+def keep_left(left: object, right: object) -> object:
+    """Conflict resolution for HashMap.update and merge that keeps the value already in the map."""
+    return left
+
+
+def make_resolver(conflict):
+    """
+    Returns the function update and merge call with (value in the map, incoming value) when a key is in both maps,
+    or None if the incoming value simply replaces the old one.
+    conflict is 'right' (the incoming value wins), 'left' (the value in the map is kept) or such a function
+    """
+    if conflict == 'right':
+        return None
+    if conflict == 'left':
+        return keep_left
+    if callable(conflict):
+        return conflict
+    raise ValueError("conflict must be 'left', 'right' or a function")
+
+
+# capacities used by the 'prime' capacity policy: the smallest prime at or above each power of two (up to 2 ** 40),
+# so that each one is roughly double the one before it
+PRIME_CAPACITIES = (2, 5, 11, 17, 37, 67, 131, 257, 521, 1031, 2053, 4099, 8209, 16411, 32771, 65537, 131101,
+                    262147, 524309, 1048583, 2097169, 4194319, 8388617, 16777259, 33554467, 67108879, 134217757,
+                    268435459, 536870923, 1073741827, 2147483659, 4294967311, 8589934609, 17179869209,
+                    34359738421, 68719476767, 137438953481, 274877906951, 549755813911, 1099511627791)
+
+CAPACITY_POLICIES = (None, 'pow2', 'prime')
+
+
+def round_capacity(capacity: int, policy: str) -> int:
+    """
+    Returns the capacity a HashMap with the given capacity policy uses when asked for capacity:
+    capacity itself (policy None), the next power of two ('pow2'), or the next prime of PRIME_CAPACITIES ('prime')
+    """
+    if policy is None:
+        return capacity
+    if policy == 'pow2':
+        return 1 << max(capacity - 1, 0).bit_length()
+    if policy == 'prime':
+        for prime in PRIME_CAPACITIES:
+            if prime >= capacity:
+                return prime
+        raise ValueError("capacity is too large for the prime capacity table")
+    raise ValueError("capacity_policy must be None, 'pow2' or 'prime'")
+
+
+def grow_capacity(capacity: int, policy: str) -> int:
+    """
+    Returns the capacity a HashMap doubles up to from capacity: twice capacity, or for the 'prime' policy the
+    next prime of the table (doubling and then rounding up could skip a step of the table)
+    """
+    if policy == 'prime':
+        return round_capacity(capacity + 1, policy)
+    return capacity * 2
+
+
+def shrink_capacity(capacity: int, policy: str) -> int:
+    """
+    Returns the capacity a HashMap halves down to from capacity: half of capacity, or for the 'prime' policy
+    the prime of the table before it
+    """
+    if policy == 'prime':
+        smaller = [prime for prime in PRIME_CAPACITIES if prime < capacity]
+        return smaller[-1] if smaller else capacity
+    return max(capacity // 2, 1)
+
+
 def hash_function_1(key: str) -> int:
     """Sample Hash function #1 to be used with HashMap implementation"""
     hash = 0
@@ -96,6 +182,160 @@ def hash_function_2(key: str) -> int:
     return hash
 
 
+FNV_OFFSET_BASIS = 0xCBF29CE484222325
+FNV_PRIME = 0x100000001B3
+MASK_64 = (1 << 64) - 1
+
+# multiplier used to scramble a hash, so that its high bits depend on all of its bits
+# (2 ** 64 divided by the golden ratio)
+HASH_MIX = 0x9E3779B97F4A7C15
+
+
+def hash_function_fnv1a(key: str) -> int:
+    """
+    64-bit FNV-1a hash of the key's UTF-8 bytes.
+    Unlike the sample hash functions, the order of the characters matters, so anagrams don't collide
+    """
+    hash = FNV_OFFSET_BASIS
+    for byte in key.encode():
+        hash = ((hash ^ byte) * FNV_PRIME) & MASK_64
+    return hash
+
+
+def hash_function_builtin(key: str) -> int:
+    """
+    Python's built-in (SipHash based) string hash, kept to 64 bits.
+    It is by far the fastest, but it changes with every process unless PYTHONHASHSEED is set,
+    so it must not be used for anything that outlives the process or is shared between processes
+    """
+    return hash(key) & MASK_64
+
+
+class KeyedHashFunction:
+    """
+    Seeded 64-bit keyed hash (BLAKE2b with the seed as its key), in the spirit of SipHash:
+    without the seed, an attacker can't craft keys that all collide (hash flooding).
+    Unlike hash_function_builtin it is the same in every process for the same seed
+    """
+
+    def __init__(self, seed: bytes) -> None:
+        """Initialize the hash function with a seed of up to 64 bytes."""
+        self.seed = seed
+
+    def __call__(self, key: str) -> int:
+        """Return the hash of the key."""
+        return int.from_bytes(blake2b(key.encode(), digest_size=8, key=self.seed).digest(), 'little')
+
+
+def hash_many(function, keys: list) -> DynamicArray:
+    """
+    Returns a DynamicArray of the hashes of all the given keys (a list of strings), in order.
+    hash_function_1, hash_function_2 and hash_function_fnv1a are computed for the whole list at once with NumPy
+    when it is installed, any other function is called once per key
+    """
+    if np is not None and keys:
+        if function is hash_function_1 or function is hash_function_2:
+            return DynamicArray(_sum_hashes_numpy(keys, function is hash_function_2))
+        if function is hash_function_fnv1a:
+            return DynamicArray(_fnv1a_hashes_numpy(keys))
+
+    return DynamicArray([function(key) for key in keys])
+
+
+def _sum_hashes_numpy(keys: list, weighted: bool) -> list:
+    """
+    Returns the list of hash_function_1 (or, if weighted, hash_function_2) values of the keys,
+    calculated over all of the keys' code points at once
+    """
+    codes = np.frombuffer(''.join(keys).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    lengths = np.fromiter(map(len, keys), dtype=np.int64, count=len(keys))
+    starts = np.cumsum(lengths) - lengths
+
+    # hash_function_2 weighs each character by its (1-based) position in its key
+    if weighted:
+        codes *= np.arange(codes.size, dtype=np.int64) - np.repeat(starts, lengths) + 1
+
+    # each key's hash is the difference of the running total at its end and at its start
+    totals = np.concatenate((np.zeros(1, dtype=np.int64), np.cumsum(codes)))
+    return (totals[starts + lengths] - totals[starts]).tolist()
+
+
+def _fnv1a_hashes_numpy(keys: list) -> list:
+    """
+    Returns the list of hash_function_fnv1a values of the keys. The hash of every key is advanced one byte
+    position at a time, over only the keys that are still long enough, so no key is padded to the longest one
+    """
+    data = [key.encode() for key in keys]
+    lengths = np.fromiter(map(len, data), dtype=np.int64, count=len(data))
+    starts = np.cumsum(lengths) - lengths
+    flat = np.frombuffer(b''.join(data), dtype=np.uint8).astype(np.uint64)
+
+    # with the keys ordered longest first, the keys that have a byte at a position are a prefix of the order
+    order = np.argsort(-lengths, kind='stable')
+    starts = starts[order]
+    descending = -lengths[order]
+
+    # uint64 arithmetic wraps around, which is the same as keeping the hash to 64 bits
+    hashes = np.full(len(data), FNV_OFFSET_BASIS, dtype=np.uint64)
+    prime = np.uint64(FNV_PRIME)
+    for position in range(int(lengths.max())):
+        count = int(np.searchsorted(descending, -position))
+        hashes[:count] = (hashes[:count] ^ flat[starts[:count] + position]) * prime
+
+    result = np.empty_like(hashes)
+    result[order] = hashes
+    return result.tolist()
+
+
+class HashMapStats:
+    """
+    Counters kept by a HashMap created with stats=True.
+    puts, gets (including contains_key) and removes count operations, hits and misses count lookups.
+    resizes and resize_time (in seconds) cover full and incremental resizes.
+    The open addressing map also fills hit_probes and miss_probes, histograms (DynamicArrays) where the value
+    at index i is the number of lookups that took i + 1 probes, and tombstones;
+    the chaining map fills chain_lengths, a histogram of the number of buckets holding a chain of each length
+    """
+
+    def __init__(self) -> None:
+        """Initialize all the counters to zero."""
+        self.puts = 0
+        self.gets = 0
+        self.removes = 0
+        self.hits = 0
+        self.misses = 0
+        self.resizes = 0
+        self.resize_time = 0.0
+        self.hit_probes = DynamicArray()
+        self.miss_probes = DynamicArray()
+        self.tombstones = 0
+        self.chain_lengths = DynamicArray()
+
+    def __str__(self) -> str:
+        """Override string method to provide more readable output."""
+        return (f"puts: {self.puts} gets: {self.gets} removes: {self.removes} "
+                f"hits: {self.hits} misses: {self.misses} "
+                f"resizes: {self.resizes} resize_time: {self.resize_time:.6f}s tombstones: {self.tombstones}\n"
+                f"hit_probes: {self.hit_probes}\nmiss_probes: {self.miss_probes}\n"
+                f"chain_lengths: {self.chain_lengths}")
+
+    def record_lookup(self, found: bool) -> None:
+        """Count a lookup as a hit or a miss."""
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def record_probes(self, found: bool, probes: int) -> None:
+        """Count a lookup that found (or didn't find) its key after the given number of probes."""
+        self.record_lookup(found)
+        histogram = self.hit_probes if found else self.miss_probes
+
+        while histogram.length() < probes:
+            histogram.append(0)
+        histogram[probes - 1] += 1
+
+
 # --------- For use in Separate Chaining (SC) HashMap  --------- #
 
 class SLNode:
@@ -103,11 +343,15 @@ class SLNode:
     Singly Linked List node for use in a hash map
     """
 
-    def __init__(self, key: str, value: object, next: "SLNode" = None) -> None:
-        """Initialize node given a key and value."""
+    # slots instead of a per-node __dict__ keep each node small
+    __slots__ = ('key', 'value', 'next', 'hash')
+
+    def __init__(self, key: str, value: object, next: "SLNode" = None, hash_val: int = None) -> None:
+        """Initialize node given a key, value and (optionally) the key's precomputed hash."""
         self.key = key
         self.value = value
         self.next = next
+        self.hash = hash_val
 
     def __str__(self) -> str:
         """Override string method to provide more readable output."""
@@ -168,20 +412,27 @@ class LinkedList:
         """Return an iterator for the list, starting at the head."""
         return LinkedListIterator(self._head)
 
-    def insert(self, key: str, value: object) -> None:
-        """Insert new node at front of the list."""
-        self._head = SLNode(key, value, self._head)
+    def insert(self, key: str, value: object, hash_val: int = None) -> None:
+        """Insert new node at front of the list, caching the key's hash if given."""
+        self._head = SLNode(key, value, self._head, hash_val)
+        self._size += 1
+
+    def insert_node(self, node: SLNode) -> None:
+        """Insert an existing node (of another list, or of a subclass of SLNode) at front of the list."""
+        node.next = self._head
+        self._head = node
         self._size += 1
 
-    def remove(self, key: str) -> bool:
+    def remove(self, key: str, hash_val: int = None) -> bool:
         """
         Remove first node with matching key.
+        If the key's hash is given, it is compared before the key itself.
         Return True if removal was successful, False otherwise.
         """
         previous, node = None, self._head
         while node:
 
-            if node.key == key:
+            if (hash_val is None or node.hash == hash_val) and node.key == key:
                 if previous:
                     previous.next = node.next
                 else:
@@ -192,11 +443,14 @@ class LinkedList:
             previous, node = node, node.next
         return False
 
-    def contains(self, key: str) -> SLNode:
-        """Return node with matching key, or None if no match"""
+    def contains(self, key: str, hash_val: int = None) -> SLNode:
+        """
+        Return node with matching key, or None if no match.
+        If the key's hash is given, it is compared before the key itself.
+        """
         node = self._head
         while node:
-            if node.key == key:
+            if (hash_val is None or node.hash == hash_val) and node.key == key:
                 return node
             node = node.next
         return node
@@ -205,15 +459,121 @@ class LinkedList:
         """Return the length of the list."""
         return self._size
 
+    def __getstate__(self) -> list:
+        """
+        Return the list's (key, value, hash) triples, head first, for pickling.
+        Pickling the nodes themselves recurses once per node, which overflows the stack on long chains.
+        """
+        return [(node.key, node.value, node.hash) for node in self]
+
+    def __setstate__(self, state: list) -> None:
+        """Rebuild the list from its pickled triples, keeping their order."""
+        self._head = None
+        self._size = 0
+        for index in range(len(state) - 1, -1, -1):
+            self.insert(*state[index])
+
+
+class SortedBucket:
+    """
+    Bucket that a HashMap switches a long chain to: the nodes are kept in an array sorted by (hash, key),
+    so finding a key is a binary search instead of a walk down the chain. The keys must be comparable.
+    Supported methods are the same as LinkedList's: insert_node, remove, contains, length, iterator
+    """
+
+    def __init__(self, nodes=()) -> None:
+        """
+        Initialize a bucket holding the given nodes (with their keys' hashes cached), for example those of
+        a LinkedList. Raises a TypeError if their keys can't be compared
+        """
+        self._nodes = sorted(nodes, key=lambda node: (node.hash, node.key))
+        self._order = [(node.hash, node.key) for node in self._nodes]
+
+        # the nodes are no longer chained to each other
+        for node in self._nodes:
+            node.next = None
+
+    def __str__(self) -> str:
+        """Override string method to provide more readable output."""
+        return 'SB [' + ', '.join(str(node) for node in self._nodes) + ']'
+
+    def __iter__(self):
+        """Return an iterator over the nodes, in (hash, key) order."""
+        return iter(self._nodes)
+
+    def insert_node(self, node: SLNode) -> None:
+        """Insert an existing node (with its key's hash cached) at its place in the order."""
+        index = bisect_right(self._order, (node.hash, node.key))
+        node.next = None
+        self._nodes.insert(index, node)
+        self._order.insert(index, (node.hash, node.key))
+
+    def _index_of(self, key: str, hash_val: int) -> int:
+        """Return the index of the node with matching key (and hash), or -1 if no match."""
+        if hash_val is None:
+            for index in range(len(self._nodes)):
+                if self._nodes[index].key == key:
+                    return index
+            return -1
+
+        index = bisect_left(self._order, (hash_val, key))
+        if index < len(self._order) and self._order[index] == (hash_val, key):
+            return index
+        return -1
+
+    def remove(self, key: str, hash_val: int = None) -> bool:
+        """
+        Remove the node with matching key.
+        Return True if removal was successful, False otherwise.
+        """
+        index = self._index_of(key, hash_val)
+        if index < 0:
+            return False
+
+        del self._nodes[index]
+        del self._order[index]
+        return True
+
+    def contains(self, key: str, hash_val: int = None) -> SLNode:
+        """
+        Return node with matching key, or None if no match.
+        Without the key's hash, the nodes are searched one by one.
+        """
+        index = self._index_of(key, hash_val)
+        return self._nodes[index] if index >= 0 else None
+
+    def length(self) -> int:
+        """Return the number of nodes in the bucket."""
+        return len(self._nodes)
+
+    def to_linked_list(self) -> LinkedList:
+        """Return a LinkedList of the bucket's nodes, in the same order."""
+        linked_list = LinkedList()
+        for index in range(len(self._nodes) - 1, -1, -1):
+            linked_list.insert_node(self._nodes[index])
+        return linked_list
+
+    def __getstate__(self) -> list:
+        """Return the bucket's (key, value, hash) triples, for pickling, like a LinkedList."""
+        return [(node.key, node.value, node.hash) for node in self._nodes]
+
+    def __setstate__(self, state: list) -> None:
+        """Rebuild the bucket from its pickled triples."""
+        self.__init__(SLNode(key, value, None, hash_val) for key, value, hash_val in state)
+
 
 # ---------- For use in Open Addressing (OA) HashMap  ---------- #
 
 class HashEntry:
 
-    def __init__(self, key: str, value: object) -> None:
-        """Initialize an entry for use in a hash map."""
+    # slots instead of a per-entry __dict__ keep each entry small
+    __slots__ = ('key', 'value', 'hash', 'is_tombstone')
+
+    def __init__(self, key: str, value: object, hash_val: int = None) -> None:
+        """Initialize an entry for use in a hash map, caching the key's hash if given."""
         self.key = key
         self.value = value
+        self.hash = hash_val
         self.is_tombstone = False
 
     def __str__(self) -> str:
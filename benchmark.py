@@ -0,0 +1,441 @@
+# Description: Benchmark harness for the two HashMap implementations, with a dict baseline.
+#              Runs put/get/remove/resize/get_keys/find_mode/delete-heavy workloads over uniform, Zipfian and
+#              adversarial (colliding) keys, and reports throughput, latency percentiles and peak memory.
+#              Results can be written as JSON and compared against the results of another commit.
+#
+#              python benchmark.py --sizes 1000 100000 --output results.json
+#              python benchmark.py --compare results.json
+#              python benchmark.py --layout-memory 100000
+#              python benchmark.py --resize-time 1000000
+
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from itertools import accumulate
+
+import hash_map_flat
+import hash_map_oa
+import hash_map_sc
+from a6_include import (DynamicArray, hash_function_1, hash_function_2,
+                        hash_function_builtin, hash_function_fnv1a)
+
+
+HASH_FUNCTIONS = {
+    'hash_function_1': hash_function_1,
+    'hash_function_2': hash_function_2,
+    'fnv1a': hash_function_fnv1a,
+    'builtin': hash_function_builtin,
+}
+
+# the maps start small so that the workloads include their growth
+INITIAL_CAPACITY = 16
+
+WORKLOADS = ('put', 'get', 'get_missing', 'get_keys', 'resize', 'find_mode', 'remove', 'delete_heavy')
+
+
+class DictMap:
+    """
+    The built-in dict behind the HashMap interface, as a baseline
+    """
+
+    def __init__(self, capacity: int, function) -> None:
+        """Initialize an empty map, the capacity and hash function are not used."""
+        self._data = {}
+
+    def put(self, key: str, value: object) -> None:
+        """Add or update a key."""
+        self._data[key] = value
+
+    def get(self, key: str) -> object:
+        """Return the value of a key, or None."""
+        return self._data.get(key)
+
+    def remove(self, key: str) -> None:
+        """Remove a key if it is there."""
+        self._data.pop(key, None)
+
+    def get_size(self) -> int:
+        """Return the number of keys."""
+        return len(self._data)
+
+    def get_capacity(self) -> int:
+        """Return the number of keys (dict manages its own capacity)."""
+        return len(self._data)
+
+    def resize_table(self, new_capacity: int) -> None:
+        """Rebuild the dict, the closest thing it has to a resize."""
+        self._data = dict(self._data)
+
+    def get_keys(self) -> DynamicArray:
+        """Return a DynamicArray of the keys."""
+        return DynamicArray(list(self._data))
+
+
+MAPS = {
+    'oa': lambda function: hash_map_oa.HashMap(INITIAL_CAPACITY, function),
+    'sc': lambda function: hash_map_sc.HashMap(INITIAL_CAPACITY, function, max_load=1.0),
+    'flat': lambda function: hash_map_flat.FlatHashMap(INITIAL_CAPACITY, function, max_load=1.0),
+    'dict': lambda function: DictMap(INITIAL_CAPACITY, function),
+}
+
+
+# ------------------------------ KEYS ---------------------------------------- #
+
+def uniform_keys(count: int, rnd: random.Random) -> list:
+    """
+    Returns count distinct keys in random order
+    """
+    keys = ['key' + str(i) for i in range(count)]
+    rnd.shuffle(keys)
+    return keys
+
+
+def zipfian_keys(count: int, rnd: random.Random, exponent: float = 1.1) -> list:
+    """
+    Returns count keys drawn (with repeats) from count distinct keys, where the i-th key is drawn
+    with a probability proportional to 1 / i ** exponent, as in real world access patterns
+    """
+    universe = ['key' + str(i) for i in range(count)]
+    cumulative = list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+    return rnd.choices(universe, cum_weights=cumulative, k=count)
+
+
+def adversarial_keys(count: int, rnd: random.Random) -> list:
+    """
+    Returns count distinct anagrams of one string. They all have the same hash_function_1 value,
+    so a map using it puts all of them in one bucket (or one probe sequence)
+    """
+    letters = list('abcdefghijklmnop')
+    keys, seen = [], set()
+    while len(keys) < count:
+        rnd.shuffle(letters)
+        key = ''.join(letters)
+        if key not in seen:
+            seen.add(key)
+            keys.append(key)
+    return keys
+
+
+DISTRIBUTIONS = {
+    'uniform': uniform_keys,
+    'zipfian': zipfian_keys,
+    'adversarial': adversarial_keys,
+}
+
+
+# ------------------------------ MEASURING ----------------------------------- #
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    """
+    Returns the throughput and latency percentiles (in microseconds) of a list of per-operation latencies
+    (in nanoseconds) that took elapsed seconds in total
+    """
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(fraction: float) -> float:
+        """Return the latency at the given fraction of the sorted latencies, in microseconds."""
+        return latencies[min(count - 1, int(fraction * count))] / 1000
+
+    return {
+        'ops': count,
+        'ops_per_sec': count / elapsed if elapsed > 0 else 0.0,
+        'p50_us': percentile(0.50),
+        'p90_us': percentile(0.90),
+        'p99_us': percentile(0.99),
+        'max_us': latencies[-1] / 1000,
+    }
+
+
+def timed(operation, arguments: list) -> dict:
+    """
+    Calls operation once for each argument, timing every call, and returns the summary of the latencies
+    """
+    clock = time.perf_counter_ns
+    latencies = []
+    start = time.perf_counter()
+    for argument in arguments:
+        before = clock()
+        operation(argument)
+        latencies.append(clock() - before)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def timed_once(operation) -> dict:
+    """
+    Calls operation once and returns the summary of its latency
+    """
+    before = time.perf_counter_ns()
+    operation()
+    latency = time.perf_counter_ns() - before
+    return summarize([latency], latency / 1e9)
+
+
+def count_mode(map_name: str, function, keys: list) -> None:
+    """
+    Finds the mode of the keys with the given map: the chaining map's find_mode, or a get/put count for the others
+    """
+    if map_name == 'sc':
+        hash_map_sc.find_mode(DynamicArray(keys))
+        return
+
+    counts = MAPS[map_name](function)
+    for key in keys:
+        count = counts.get(key)
+        counts.put(key, 1 if count is None else count + 1)
+
+
+def run_workloads(map_name: str, function, keys: list, rnd: random.Random) -> dict:
+    """
+    Returns a dictionary of workload name to its summary, for the given map and keys
+    """
+    results = {}
+    map = MAPS[map_name](function)
+    missing = ['missing' + key for key in keys]
+
+    results['put'] = timed(lambda key: map.put(key, key), keys)
+    results['get'] = timed(map.get, keys)
+    results['get_missing'] = timed(map.get, missing)
+    results['get_keys'] = timed_once(map.get_keys)
+    results['resize'] = timed_once(lambda: map.resize_table(map.get_capacity() * 2))
+    results['find_mode'] = timed_once(lambda: count_mode(map_name, function, keys))
+    results['remove'] = timed(map.remove, keys)
+
+    # delete heavy: fills the map, then removes 90% of the keys and looks up every key (mostly misses),
+    # which is where tombstones (or long chains left by a table that never shrinks) hurt
+    map = MAPS[map_name](function)
+    for key in keys:
+        map.put(key, key)
+    removed = keys[:len(keys) * 9 // 10]
+    rnd.shuffle(removed)
+    operations = [('remove', key) for key in removed] + [('get', key) for key in keys]
+
+    def delete_heavy(operation: tuple) -> None:
+        """Run one operation of the mix."""
+        if operation[0] == 'remove':
+            map.remove(operation[1])
+        else:
+            map.get(operation[1])
+
+    results['delete_heavy'] = timed(delete_heavy, operations)
+    return results
+
+
+def peak_memory(map_name: str, function, keys: list) -> int:
+    """
+    Returns the peak number of bytes allocated while putting all the keys into a new map
+    """
+    tracemalloc.start()
+    map = MAPS[map_name](function)
+    for key in keys:
+        map.put(key, key)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def git_commit() -> str:
+    """
+    Returns the commit of the checkout the benchmark lives in (wherever it is run from),
+    or None outside of a git checkout
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes: list, maps: list, distributions: list, hash_name: str, workloads: list,
+                  memory: bool, seed: int) -> dict:
+    """
+    Runs every combination of size, map and key distribution, printing each result as it goes,
+    and returns all the results along with the information needed to compare them later
+    """
+    function = HASH_FUNCTIONS[hash_name]
+    results = []
+
+    for size in sizes:
+        for distribution in distributions:
+            keys = DISTRIBUTIONS[distribution](size, random.Random(seed))
+            for map_name in maps:
+                summaries = run_workloads(map_name, function, keys, random.Random(seed))
+                peak = peak_memory(map_name, function, keys) if memory else None
+
+                for workload in workloads:
+                    record = {'map': map_name, 'distribution': distribution, 'size': size,
+                              'hash': hash_name, 'workload': workload, **summaries[workload]}
+                    if workload == 'put' and peak is not None:
+                        record['peak_bytes'] = peak
+                    results.append(record)
+                    print_record(record)
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': seed,
+        'results': results,
+    }
+
+
+# ------------------------------ REPORTING ----------------------------------- #
+
+def record_key(record: dict) -> tuple:
+    """
+    Returns what identifies a result, so the same measurement can be found in another run
+    """
+    return record['map'], record['distribution'], record['size'], record['hash'], record['workload']
+
+
+def print_record(record: dict) -> None:
+    """
+    Prints one result as a line of the results table
+    """
+    line = (f"{record['map']:<5} {record['distribution']:<12} {record['size']:>9} {record['workload']:<13}"
+            f"{record['ops_per_sec']:>14,.0f} ops/s  p50 {record['p50_us']:>9.2f}us  "
+            f"p99 {record['p99_us']:>9.2f}us  max {record['max_us']:>11.2f}us")
+    if 'peak_bytes' in record:
+        line += f"  peak {record['peak_bytes'] / 2 ** 20:.1f}MiB"
+    print(line, flush=True)
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """
+    Prints the throughput of every result in current relative to the same result in baseline
+    """
+    before = {record_key(record): record for record in baseline['results']}
+    print(f"Compared to {baseline.get('commit')} ({baseline.get('timestamp')})")
+
+    matched = 0
+    for record in current['results']:
+        old = before.get(record_key(record))
+        if old is None or old['ops_per_sec'] == 0:
+            continue
+        matched += 1
+        ratio = record['ops_per_sec'] / old['ops_per_sec']
+        flag = '  <-- slower' if ratio < 0.9 else ''
+        print(f"{record['map']:<5} {record['distribution']:<12} {record['size']:>9} {record['workload']:<13}"
+              f"{ratio:>7.2f}x{flag}")
+
+    # results with other sizes, maps, distributions, hash functions or workloads can't be compared
+    if matched == 0:
+        print("No matching records: the baseline was run with other sizes, maps, distributions, hash or workloads")
+
+
+def memory_per_key(make_map, keys: list) -> float:
+    """
+    Returns the number of bytes allocated per key while building a map of the given keys
+    The keys (and the values, which are the keys themselves) are created beforehand, so only the map is counted
+    """
+    tracemalloc.start()
+    map = make_map()
+    for key in keys:
+        map.put(key, key)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(keys)
+
+
+def memory_benchmark(count: int) -> None:
+    """
+    Prints the bytes per key used by each storage layout for a map of count keys
+    hash_function_builtin is used so that the measurement is not slowed down by collisions
+    """
+    keys = ['key' + str(i) for i in range(count)]
+    layouts = (
+        ("OA (HashEntry objects)", lambda: hash_map_oa.HashMap(count, hash_function_builtin)),
+        ("OA (compact arrays)", lambda: hash_map_oa.HashMap(count, hash_function_builtin, compact=True)),
+        ("SC (LinkedList of SLNode)", lambda: hash_map_sc.HashMap(count, hash_function_builtin)),
+        ("SC (flat arrays)", lambda: hash_map_flat.FlatHashMap(count, hash_function_builtin)),
+    )
+
+    print(f"Memory per key, {count} keys")
+    for name, make_map in layouts:
+        print(f"  {name:<28} {memory_per_key(make_map, keys):8.1f} bytes")
+
+
+def resize_benchmark(count: int, repeats: int = 3) -> None:
+    """
+    Prints the seconds that resize_table takes per million entries, doubling a full map of count keys,
+    for each storage layout (the best of repeats runs, each on a newly built map, so that every run
+    resizes the same table)
+    """
+    keys = ['key' + str(i) for i in range(count)]
+    layouts = (
+        ("OA (HashEntry objects)", lambda: hash_map_oa.HashMap(INITIAL_CAPACITY, hash_function_fnv1a)),
+        ("OA (compact arrays)", lambda: hash_map_oa.HashMap(INITIAL_CAPACITY, hash_function_fnv1a, compact=True)),
+        ("OA (Robin Hood)", lambda: hash_map_oa.HashMap(INITIAL_CAPACITY, hash_function_fnv1a,
+                                                        probing=hash_map_oa.RobinHoodProbing())),
+        ("SC (LinkedList of SLNode)", lambda: hash_map_sc.HashMap(INITIAL_CAPACITY, hash_function_fnv1a,
+                                                                  max_load=1.0)),
+        ("SC (flat arrays)", lambda: hash_map_flat.FlatHashMap(INITIAL_CAPACITY, hash_function_fnv1a, max_load=1.0)),
+    )
+
+    print(f"resize_table time per million entries, {count} keys")
+    for name, make_map in layouts:
+        best = None
+        for _ in range(repeats):
+            map = make_map()
+            for key in keys:
+                map.put(key, key)
+
+            start = time.perf_counter()
+            map.resize_table(map.get_capacity() * 2)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"  {name:<28} {best * 1e6 / count:8.3f} s")
+
+
+def main(arguments: list) -> None:
+    """
+    Parses the command line and runs the benchmark
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the HashMap implementations against dict.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help="numbers of keys to run with (1000 up to 10000000)")
+    parser.add_argument('--maps', nargs='+', choices=sorted(MAPS), default=['oa', 'sc', 'dict'])
+    parser.add_argument('--distributions', nargs='+', choices=sorted(DISTRIBUTIONS),
+                        default=['uniform', 'zipfian'],
+                        help="key distributions (adversarial keys are quadratic for weak hash functions)")
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument('--hash', choices=sorted(HASH_FUNCTIONS), default='fnv1a')
+    parser.add_argument('--memory', action='store_true', help="also measure peak memory (slower)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="compare the results with those in this JSON file")
+    parser.add_argument('--layout-memory', type=int, metavar='COUNT',
+                        help="only print the bytes per key of each storage layout for COUNT keys")
+    parser.add_argument('--resize-time', type=int, metavar='COUNT',
+                        help="only print the resize_table time per million entries of each layout for COUNT keys")
+    options = parser.parse_args(arguments)
+
+    if options.layout_memory:
+        memory_benchmark(options.layout_memory)
+        return
+
+    if options.resize_time:
+        resize_benchmark(options.resize_time)
+        return
+
+    report = run_benchmark(options.sizes, options.maps, options.distributions, options.hash,
+                           options.workloads, options.memory, options.seed)
+
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if options.compare:
+        with open(options.compare) as file:
+            compare(json.load(file), report)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
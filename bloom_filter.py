@@ -0,0 +1,390 @@
+# Description: A counting Bloom filter, and a front for either HashMap that keeps one next to the map so that
+#              lookups of keys that are definitely missing never reach the table.
+#              A miss in the open addressing map probes until it reaches an empty slot (walking past every
+#              tombstone on the way), and a miss in the chaining map walks a whole chain; a filter check is a
+#              few array reads instead. The filter keeps a small counter per position rather than a bit, so
+#              removed keys can be taken out of it again.
+#
+#              The filter works from the map's own hash of a key, so the key is still hashed only once. Keys
+#              whose hashes the map's hash function makes equal can't be told apart by the filter either, so it
+#              works best with a hash function that spreads keys well (hash_function_fnv1a, hash_function_builtin
+#              or a KeyedHashFunction rather than the sample hash functions).
+#
+#              The filter only pays off in front of the open addressing map. A chaining miss looks at about
+#              table_load() nodes, which at the usual loads costs no more than the filter check itself, so in
+#              front of the chaining map the filter adds its cost to every lookup and saves little.
+
+
+from math import ceil, log
+
+from a6_include import HASH_MIX, MASK_64
+import hash_map_oa
+from hash_map_oa import _NOT_FOUND
+import hash_map_sc
+
+
+# highest value of a counter. A counter that reaches it stays there, since it can no longer be counted down exactly
+MAX_COUNT = 255
+
+
+class CountingBloomFilter:
+    """
+    Bloom filter with a byte-sized counter per position, so that keys can be removed as well as added.
+    A key is given to it as its 64-bit hash. might_contain never answers False for a key that was added
+    (and not removed), and answers True for a key that wasn't with a probability of about error_rate,
+    as long as no more than capacity keys are in it
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        """
+        Initialize an empty filter sized for capacity keys at the given false positive rate
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        # the usual optimal sizes: size = -n ln p / (ln 2) ** 2 counters and size / n * ln 2 hashes per key
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._size = max(ceil(-capacity * log(error_rate) / log(2) ** 2), 1)
+        self._hash_count = max(round(self._size / capacity * log(2)), 1)
+        self._counts = bytearray(self._size)
+
+    def get_capacity(self) -> int:
+        """Return the number of keys the filter was sized for."""
+        return self._capacity
+
+    def get_error_rate(self) -> float:
+        """Return the false positive rate the filter was sized for."""
+        return self._error_rate
+
+    def _positions(self, hash_val: int):
+        """
+        Yield the counter positions of a hash: hash_count positions h1 + i * h2 (double hashing),
+        where h2 comes from a scrambled copy of the hash
+        """
+        first = hash_val & MASK_64
+        second = (((hash_val * HASH_MIX) & MASK_64) >> 32) | 1
+        for number in range(self._hash_count):
+            yield (first + number * second) % self._size
+
+    def add(self, hash_val: int) -> None:
+        """Add a key, by its hash."""
+        counts = self._counts
+        for position in self._positions(hash_val):
+            if counts[position] < MAX_COUNT:
+                counts[position] += 1
+
+    def discard(self, hash_val: int) -> None:
+        """Remove a key that was added, by its hash."""
+        counts = self._counts
+        for position in self._positions(hash_val):
+            if 0 < counts[position] < MAX_COUNT:
+                counts[position] -= 1
+
+    def might_contain(self, hash_val: int) -> bool:
+        """Return False if the key with the given hash was definitely not added, True if it may have been."""
+        # the positions are worked out inline, since a missing key is usually ruled out by the first one or two
+        counts, size = self._counts, self._size
+        first = hash_val & MASK_64
+        second = (((hash_val * HASH_MIX) & MASK_64) >> 32) | 1
+        for number in range(self._hash_count):
+            if counts[(first + number * second) % size] == 0:
+                return False
+        return True
+
+    def clear(self) -> None:
+        """Remove every key."""
+        self._counts = bytearray(self._size)
+
+
+class FilterStats:
+    """
+    Counters kept by a BloomFilteredMap. lookups counts get, contains_key and remove calls, skipped those the
+    filter answered alone (definite misses), and false_positives those it let through for a key that wasn't there.
+    A skipped get or contains_key is still counted as a miss in the map's own HashMapStats (if it keeps them),
+    but it adds nothing to the map's miss_probes, which only cover the lookups that reached the table
+    """
+
+    def __init__(self) -> None:
+        """Initialize all the counters to zero."""
+        self.lookups = 0
+        self.skipped = 0
+        self.false_positives = 0
+        self.probes_saved = 0.0
+
+    def __str__(self) -> str:
+        """Override string method to provide more readable output."""
+        return (f"lookups: {self.lookups} skipped: {self.skipped} false_positives: {self.false_positives} "
+                f"probes_saved: {self.probes_saved:.0f}")
+
+
+class BloomFilteredMap:
+    def __init__(self, map, capacity: int = 1024, error_rate: float = 0.01) -> None:
+        """
+        Initialize the front over a chaining or open addressing HashMap (and any keys already in it), with
+        a CountingBloomFilter sized for capacity keys at the given false positive rate. The filter is rebuilt
+        twice as big whenever the map outgrows it. Writes must go through the front to keep the filter right.
+        The front saves time in front of an open addressing map; a chaining miss is usually as cheap as the filter
+        """
+        self._map = map
+        self._error_rate = error_rate
+        self._open_addressing = isinstance(map, hash_map_oa.HashMap)
+        self._stats = FilterStats()
+        self._rebuild(max(capacity, map.get_size()))
+
+    def get_map(self):
+        """
+        Returns the wrapped HashMap
+        """
+        return self._map
+
+    def get_size(self) -> int:
+        """
+        Returns the number of keys in the hash map
+        """
+        return self._map.get_size()
+
+    def get_stats(self) -> FilterStats:
+        """
+        Returns the front's counters. probes_saved estimates the slots (open addressing) or chain nodes
+        (chaining) that the skipped lookups would have looked at, at the map's current miss cost
+        """
+        self._stats.probes_saved = self._stats.skipped * self._miss_cost()
+        return self._stats
+
+    def _hash(self, key: str) -> int:
+        """
+        Returns the hash of a key, in the form the wrapped map keeps it in
+        """
+        hash_val = self._map._hash_function(key)
+        if self._open_addressing:
+            return hash_val & hash_map_oa.HASH_MASK
+        return hash_val
+
+    def _rebuild(self, capacity: int) -> None:
+        """
+        Returns nothing. Replaces the filter with one sized for capacity keys, holding the keys of the map
+        (by their cached hashes, so no key is hashed again)
+        """
+        self._filter = CountingBloomFilter(capacity, self._error_rate)
+        for hash_val in self._hashes():
+            self._filter.add(hash_val)
+
+    def _hashes(self):
+        """
+        Yields the cached hash of every key in the map. While the map is resizing incrementally, both its old
+        and its new array are walked as they are, so that the resize is left to go on at its own pace
+        """
+        map = self._map
+        for buckets in (map._buckets, map._old_buckets):
+            if buckets is None:
+                continue
+
+            for index in range(buckets.length()):
+                if self._open_addressing:
+                    if buckets.state(index) == hash_map_oa.LIVE:
+                        yield buckets.hash_at(index)
+                elif buckets[index] is not None:
+                    # moved old buckets (and new ones not created yet) are None
+                    for node in buckets[index]:
+                        yield node.hash
+
+    def _miss_cost(self) -> float:
+        """
+        Returns the number of slots or nodes a lookup of a missing key looks at, on average. The open addressing
+        map's own probe counts are used when it keeps stats, otherwise the expected cost with uniform hashing,
+        1 / (1 - load) with the tombstones counted in the load; a chaining miss walks a chain of average length
+        """
+        map = self._map
+        if not self._open_addressing:
+            return map.table_load()
+
+        stats = map._stats
+        if stats is not None and stats.miss_probes.length() > 0:
+            total, count = 0, 0
+            for index in range(stats.miss_probes.length()):
+                total += (index + 1) * stats.miss_probes[index]
+                count += stats.miss_probes[index]
+            return total / count
+
+        used = (map.get_size() + map.get_tombstones()) / map.get_capacity()
+        return 1 / (1 - used) if used < 1 else float(map.get_capacity())
+
+    def _count_operation(self, name: str) -> None:
+        """
+        Returns nothing. Counts an operation in the map's stats (if it keeps them), as the map's own put, get,
+        contains_key or remove would, since the front calls the map's internals instead
+        """
+        stats = self._map._stats
+        if stats is not None:
+            setattr(stats, name, getattr(stats, name) + 1)
+
+    def _count_skipped_miss(self) -> None:
+        """
+        Returns nothing. Counts a get or contains_key that the filter answered as a miss in the map's stats
+        (if it keeps them), so that the map's hits and misses still add up to its lookups
+        """
+        stats = self._map._stats
+        if stats is not None:
+            stats.record_lookup(False)
+
+    def _skip(self, hash_val: int) -> bool:
+        """
+        Returns True if the filter shows that the key with the given hash is definitely not in the map,
+        counting the lookup either way
+        """
+        self._stats.lookups += 1
+        if self._filter.might_contain(hash_val):
+            return False
+
+        self._stats.skipped += 1
+        return True
+
+    def _lookup(self, key: str, hash_val: int) -> object:
+        """
+        Returns the value of a key that got past the filter, or _NOT_FOUND (counting a false positive)
+        """
+        if self._open_addressing:
+            value = self._map._lookup(key, hash_val)
+        else:
+            node = self._map.find_bucket(key, hash_val).contains(key, hash_val)
+            value = _NOT_FOUND if node is None else node.value
+            # the open addressing map's _lookup counts the lookup itself, the chaining map's get does it here
+            if self._map._stats is not None:
+                self._map._stats.record_lookup(node is not None)
+
+        if value is _NOT_FOUND:
+            self._stats.false_positives += 1
+        return value
+
+    def get(self, key: str) -> object:
+        """
+        Given a key, returns the value of that key if it is in the hash map. Otherwise, returns None
+        """
+        self._count_operation('gets')
+        hash_val = self._hash(key)
+        if self._skip(hash_val):
+            self._count_skipped_miss()
+            return None
+
+        value = self._lookup(key, hash_val)
+        return None if value is _NOT_FOUND else value
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Given a key, returns True if the key is in the hash map (even if its value is None). Otherwise, returns False
+        """
+        self._count_operation('gets')
+        hash_val = self._hash(key)
+        if self._skip(hash_val):
+            self._count_skipped_miss()
+            return False
+        return self._lookup(key, hash_val) is not _NOT_FOUND
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Returns nothing. Adds a key with a value to the hash map, or updates the key if it already exists
+        """
+        self._count_operation('puts')
+        hash_val = self._hash(key)
+        size = self._map.get_size()
+        self._map._put(key, value, hash_val)
+
+        # only a key that is new to the map is added to the filter, since the counters count keys
+        if self._map.get_size() > size:
+            self._filter.add(hash_val)
+            if self._map.get_size() > self._filter.get_capacity():
+                self._rebuild(self._filter.get_capacity() * 2)
+
+    def remove(self, key: str) -> None:
+        """
+        Returns nothing. Given a key, removes it from the hash map if it is there
+        """
+        self._count_operation('removes')
+        hash_val = self._hash(key)
+        if self._skip(hash_val):
+            return
+
+        size = self._map.get_size()
+        self._map._remove(key, hash_val)
+        if self._map.get_size() < size:
+            self._filter.discard(hash_val)
+        else:
+            self._stats.false_positives += 1
+
+    def clear(self) -> None:
+        """
+        Returns nothing. Clears the hash map and the filter (the counters are kept)
+        """
+        self._map.clear()
+        self._filter.clear()
+
+    def items(self):
+        """
+        Returns a generator over the (key, value) pairs of the hash map
+        """
+        return self._map.items()
+
+    def keys(self):
+        """
+        Returns a generator over the keys of the hash map
+        """
+        return self._map.keys()
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+    import time
+
+    from a6_include import hash_function_builtin, hash_function_fnv1a
+
+    print("\nCountingBloomFilter")
+    print("-------------------")
+    bloom = CountingBloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(hash_function_fnv1a('key' + str(i)))
+    false_positives = sum(bloom.might_contain(hash_function_fnv1a('other' + str(i))) for i in range(100000))
+    print(all(bloom.might_contain(hash_function_fnv1a('key' + str(i))) for i in range(1000)),
+          false_positives / 100000)
+    bloom.discard(hash_function_fnv1a('key0'))
+    print(bloom.might_contain(hash_function_fnv1a('key0')))
+
+    print("\nBloomFilteredMap")
+    print("----------------")
+    keys = ['key' + str(i) for i in range(50000)]
+    missing = ['missing' + str(i) for i in range(50000)]
+
+    # both maps keep stats, so the skipped misses can be seen in the map's own counters. The chaining map is
+    # shown for comparison: its misses are about as cheap as the filter check, so the front doesn't speed it up
+    for name, make_map in (('oa', lambda: hash_map_oa.HashMap(16, hash_function_builtin, stats=True)),
+                           ('sc', lambda: hash_map_sc.HashMap(16, hash_function_builtin, max_load=1.0,
+                                                              stats=True))):
+        plain = make_map()
+        filtered = BloomFilteredMap(make_map())
+        for key in keys:
+            plain.put(key, key)
+            filtered.put(key, key)
+
+        # removing most of the keys leaves tombstones behind in the open addressing map
+        for key in keys[:40000]:
+            plain.remove(key)
+            filtered.remove(key)
+
+        start = time.perf_counter()
+        for key in missing:
+            plain.get(key)
+        plain_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in missing:
+            filtered.get(key)
+        filtered_time = time.perf_counter() - start
+
+        print(f"{name}: misses {plain_time:.3f}s without the filter, {filtered_time:.3f}s with it, "
+              f"size {filtered.get_size()}, {filtered.get('key49999')}, {filtered.contains_key('key0')}")
+        print(filtered.get_stats())
+        map_stats = filtered.get_map().get_stats()
+        print(f"map gets: {map_stats.gets} hits: {map_stats.hits} misses: {map_stats.misses}")
@@ -0,0 +1,274 @@
+# Description: An asyncio facade over either HashMap, for use inside an event loop.
+#              No call holds the event loop for more than a bounded amount of work: before a write that would
+#              grow the table, the facade sets up the bigger table itself and moves the buckets over step at a
+#              time, and explicit resizes, bulk loads and full scans also work step buckets (or keys) at a time,
+#              handing control back to the loop in between. A map can also be built from scratch in an executor
+#              with load.
+
+
+import asyncio
+
+from a6_include import DynamicArray, LinkedList, hash_many, round_capacity, to_list
+import hash_map_oa
+import hash_map_sc
+
+
+class AsyncHashMap:
+    def __init__(self, map, step: int = 256) -> None:
+        """
+        Initialize the facade over a chaining or open addressing HashMap. The map is switched to incremental
+        resizing (moving step buckets per operation) if it doesn't resize incrementally already.
+        Writes through the facade wait for a running scan or resize to finish, reads never wait
+        """
+        if step < 1:
+            raise ValueError("step must be at least 1")
+
+        if map._migrate_step is None:
+            map._migrate_step = step
+
+        self._map = map
+        self._step = step
+        self._lock = asyncio.Lock()
+
+    def get_map(self):
+        """
+        Returns the wrapped HashMap
+        """
+        return self._map
+
+    def get_size(self) -> int:
+        """
+        Returns the number of keys in the hash map
+        """
+        return self._map.get_size()
+
+    def get_capacity(self) -> int:
+        """
+        Returns the capacity of the hash map
+        """
+        return self._map.get_capacity()
+
+    async def get(self, key: str) -> object:
+        """
+        Given a key, returns the value of that key if it is in the hash map. Otherwise, returns None
+        """
+        return self._map.get(key)
+
+    async def contains_key(self, key: str) -> bool:
+        """
+        Given a key, returns True if the key is in the hash map (even if its value is None). Otherwise, returns False
+        """
+        return self._map.contains_key(key)
+
+    async def put(self, key: str, value: object) -> None:
+        """
+        Returns nothing. Adds a key with a value to the hash map, or updates the key if it already exists
+        """
+        async with self._lock:
+            await self._grow_for(1)
+            self._map.put(key, value)
+
+    async def remove(self, key: str) -> None:
+        """
+        Returns nothing. Given a key, removes it from the hash map if it is there
+        """
+        async with self._lock:
+            self._map.remove(key)
+
+    async def put_many(self, pairs) -> None:
+        """
+        Returns nothing. Adds (or updates) every (key, value) pair of an iterable or DynamicArray of pairs,
+        step pairs at a time. Growing the table is done incrementally along the way, instead of all at once
+        """
+        pairs = to_list(pairs)
+        map = self._map
+
+        async with self._lock:
+            await self._grow_for(len(pairs))
+            for start in range(0, len(pairs), self._step):
+                chunk = pairs[start:start + self._step]
+                hashes = hash_many(map._hash_function, [pair[0] for pair in chunk])
+                for index in range(len(chunk)):
+                    map._put(chunk[index][0], chunk[index][1], self._hash_of(hashes[index]))
+                await asyncio.sleep(0)
+
+    async def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a DynamicArray with the value of each key of an iterable or DynamicArray of keys, in order
+        (None for keys that are not in the hash map), looking up step keys at a time
+        """
+        keys = to_list(keys)
+        values = DynamicArray()
+
+        for start in range(0, len(keys), self._step):
+            chunk_values = self._map.get_many(keys[start:start + self._step])
+            for index in range(chunk_values.length()):
+                values.append(chunk_values[index])
+            await asyncio.sleep(0)
+
+        return values
+
+    async def remove_many(self, keys) -> None:
+        """
+        Returns nothing. Removes every key of an iterable or DynamicArray of keys, step keys at a time
+        """
+        keys = to_list(keys)
+
+        async with self._lock:
+            for start in range(0, len(keys), self._step):
+                self._map.remove_many(keys[start:start + self._step])
+                await asyncio.sleep(0)
+
+    async def resize_table(self, new_capacity: int) -> None:
+        """
+        Returns nothing. Resizes the hash table to the new capacity, moving step buckets at a time.
+        Lookups keep working (on both the old and the new buckets) while it runs
+        """
+        map = self._map
+        if new_capacity < 1:
+            return
+        if isinstance(map, hash_map_oa.HashMap) and new_capacity < map.get_size():
+            return
+
+        async with self._lock:
+            await self._resize(new_capacity)
+
+    async def _grow_for(self, count: int) -> None:
+        """
+        Returns nothing. If adding count keys would make the map grow, grows it first, step buckets at a time
+        """
+        new_capacity = self._map._reserve_capacity(count)
+        if new_capacity != self._map.get_capacity():
+            await self._resize(new_capacity)
+
+    async def _resize(self, new_capacity: int) -> None:
+        """
+        Returns nothing. Does the work of resize_table, with the lock held
+        """
+        map = self._map
+        await self._finish_resize()
+
+        # the new array is also created step slots (or buckets) at a time, before the resize starts.
+        # It is made for the capacity the map's capacity policy rounds new_capacity to
+        if isinstance(map, hash_map_sc.HashMap):
+            new_capacity = round_capacity(new_capacity, map._capacity_policy)
+            buckets = DynamicArray()
+            while buckets.length() < new_capacity:
+                for _ in range(min(self._step, new_capacity - buckets.length())):
+                    buckets.append(LinkedList())
+                await asyncio.sleep(0)
+            map._start_resize(new_capacity, buckets)
+        else:
+            # the open addressing map's own resize_table grows the capacity until the keys fill less than half
+            # of it, and the incremental resize needs the same room to place every key
+            new_capacity = map._fit_capacity(new_capacity)
+            table = map._table_class(0)
+            while table.length() < new_capacity:
+                table.extend(min(self._step, new_capacity - table.length()))
+                await asyncio.sleep(0)
+            map._start_resize(new_capacity, table)
+
+        await self._finish_resize()
+
+    async def items(self):
+        """
+        Asynchronously yields the (key, value) pairs of the hash map, handing control back to the loop after
+        every step pairs. Writes through the facade wait until the scan is done
+        """
+        async with self._lock:
+            await self._finish_resize()
+
+            count = 0
+            for pair in self._map.items():
+                yield pair
+                count += 1
+                if count % self._step == 0:
+                    await asyncio.sleep(0)
+
+    async def get_keys(self) -> DynamicArray:
+        """
+        Returns a DynamicArray created of all the keys in the hash map, gathered step keys at a time
+        """
+        keys = DynamicArray()
+        async for key, _ in self.items():
+            keys.append(key)
+        return keys
+
+    async def _finish_resize(self) -> None:
+        """
+        Returns nothing. Moves the rest of a running incremental resize over, step buckets at a time
+        """
+        map = self._map
+        while map._old_buckets is not None:
+            map._migrate_buckets(self._step)
+            await asyncio.sleep(0)
+
+    def _hash_of(self, hash_val: int) -> int:
+        """
+        Returns a hash in the form the wrapped map keeps it in
+        """
+        if isinstance(self._map, hash_map_oa.HashMap):
+            return hash_val & hash_map_oa.HASH_MASK
+        return hash_val
+
+    @classmethod
+    async def load(cls, factory, pairs, step: int = 256, executor=None) -> "AsyncHashMap":
+        """
+        Returns a facade over a new HashMap made by factory() and filled with pairs. The whole build runs in an
+        executor (the loop's default thread pool if none is given), since no one else can see the map yet
+        """
+        def build():
+            map = factory()
+            map.put_many(pairs)
+            return map
+
+        map = await asyncio.get_running_loop().run_in_executor(executor, build)
+        return cls(map, step)
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+    import time
+
+    import hash_map_sc
+    from a6_include import hash_function_fnv1a
+
+    async def watch_latency(stop: asyncio.Event) -> float:
+        """
+        Returns the longest time the loop took to come back to this task while stop was not set
+        """
+        worst = 0.0
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0)
+            worst = max(worst, time.perf_counter() - start)
+        return worst
+
+    async def main() -> None:
+        pairs = [('key' + str(i), i) for i in range(200000)]
+
+        for name, map in (('oa', hash_map_oa.HashMap(16, hash_function_fnv1a)),
+                          ('sc', hash_map_sc.HashMap(16, hash_function_fnv1a, max_load=1.0))):
+            facade = AsyncHashMap(map)
+            stop = asyncio.Event()
+            watcher = asyncio.create_task(watch_latency(stop))
+
+            await facade.put_many(pairs)
+            await facade.resize_table(facade.get_capacity() * 4)
+            keys = await facade.get_keys()
+            values = await facade.get_many(['key0', 'key199999', 'missing'])
+
+            stop.set()
+            worst = await watcher
+            print(f"{name}: size {facade.get_size()} capacity {facade.get_capacity()} keys {keys.length()} "
+                  f"values {values} longest loop stall {worst * 1000:.1f}ms")
+
+        facade = await AsyncHashMap.load(lambda: hash_map_oa.HashMap(16, hash_function_fnv1a), pairs[:1000])
+        await facade.put('extra', None)
+        await facade.remove('key0')
+        print(facade.get_size(), await facade.get('key1'), await facade.contains_key('extra'))
+
+    print("\nAsyncHashMap")
+    print("------------")
+    asyncio.run(main())
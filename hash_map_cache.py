@@ -0,0 +1,291 @@
+# Description: A bounded LRU or LFU cache built on the separate chaining HashMap.
+#              Each cached key is a CacheNode, an SLNode that sits in its bucket's chain like any other node and
+#              is also threaded into the cache's eviction order. So get, put and evicting the next victim are all
+#              O(1): the node found in the chain is moved in the eviction order without searching for it.
+#
+#              LRU keeps one list ordered from least to most recently used. LFU keeps the nodes in groups by use
+#              count (least used group first, each group ordered by recency), and evicts the least recently used
+#              node of the least used group.
+
+
+import sys
+import time
+
+from a6_include import SLNode
+from hash_map_sc import HashMap, CountGroup, CountGroups
+
+
+class CacheNode(SLNode):
+    """
+    Node of a BoundedCache: an SLNode of a bucket's chain that also links into its group in the eviction order
+    """
+
+    __slots__ = ('group', 'older', 'newer', 'expires', 'size')
+
+    def __init__(self, key: str, value: object, hash_val: int, expires: float, size: int) -> None:
+        """Initialize a node, not yet linked into any chain or group."""
+        super().__init__(key, value, None, hash_val)
+        self.group = None
+        self.older = None
+        self.newer = None
+        self.expires = expires
+        self.size = size
+
+
+class CacheStats:
+    """
+    Counters kept by a BoundedCache. A lookup of an expired key counts as a miss and as an expiration
+    """
+
+    def __init__(self) -> None:
+        """Initialize all the counters to zero."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __str__(self) -> str:
+        """Override string method to provide more readable output."""
+        return (f"hits: {self.hits} misses: {self.misses} evictions: {self.evictions} "
+                f"expirations: {self.expirations}")
+
+
+class BoundedCache:
+    def __init__(self, function, max_entries: int = None, max_bytes: int = None, policy: str = 'lru',
+                 ttl: float = None, sizeof=None, clock=time.monotonic) -> None:
+        """
+        Initialize new BoundedCache, which evicts keys by policy ('lru' or 'lfu') to stay within max_entries keys
+        and max_bytes bytes (at least one of them must be given). The size of an entry is sizeof(key) + sizeof(value)
+        (sys.getsizeof by default). When ttl (in seconds of clock) is given, keys expire that long after their put
+        """
+        if max_entries is None and max_bytes is None:
+            raise ValueError("max_entries or max_bytes must be given")
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        if policy not in ('lru', 'lfu'):
+            raise ValueError("policy must be 'lru' or 'lfu'")
+
+        self._map = HashMap(16, function, max_load=1.0)
+        self._hash_function = function
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lfu = policy == 'lfu'
+        self._ttl = ttl
+        self._sizeof = sizeof if sizeof is not None else sys.getsizeof
+        self._clock = clock
+
+        self._bytes = 0
+        self._stats = CacheStats()
+
+        # the groups of the eviction order, least used first (an LRU cache only ever has one group)
+        self._groups = CountGroups()
+
+    def __str__(self) -> str:
+        """
+        Override string method to provide more readable output
+        """
+        return str(self._map)
+
+    def get_size(self) -> int:
+        """
+        Returns the number of keys in the cache (including expired keys that have not been dropped yet)
+        """
+        return self._map.get_size()
+
+    def get_bytes(self) -> int:
+        """
+        Returns the total size of the cached entries
+        """
+        return self._bytes
+
+    def get_stats(self) -> CacheStats:
+        """
+        Returns the cache's hit, miss, eviction and expiration counters
+        """
+        return self._stats
+
+    def _find(self, key: str, hash_val: int) -> CacheNode:
+        """
+        Returns the node of a key, or None if the key is not cached. An expired key is dropped and not returned
+        """
+        node = self._map.find_bucket(key, hash_val).contains(key, hash_val)
+        if node is not None and node.expires is not None and node.expires <= self._clock():
+            self._drop(node)
+            self._stats.expirations += 1
+            return None
+        return node
+
+    def get(self, key: str) -> object:
+        """
+        Given a key, returns its cached value (marking it as used), or None if it is not cached or has expired
+        """
+        node = self._find(key, self._hash_function(key))
+        if node is None:
+            self._stats.misses += 1
+            return None
+
+        self._stats.hits += 1
+        self._touch(node)
+        return node.value
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Given a key, returns True if it is cached and has not expired, without marking it as used
+        """
+        return self._find(key, self._hash_function(key)) is not None
+
+    def put(self, key: str, value: object, ttl: float = None) -> None:
+        """
+        Returns nothing. Caches a value for a key (marking it as used), evicting other keys to keep the cache
+        within its limits. ttl overrides the cache's ttl for this key. An entry bigger than max_bytes is not kept
+        """
+        hash_val = self._hash_function(key)
+        if ttl is None:
+            ttl = self._ttl
+        expires = self._clock() + ttl if ttl is not None else None
+        size = self._sizeof(key) + self._sizeof(value)
+
+        node = self._find(key, hash_val)
+
+        # an entry that could never fit is not cached (and an older value of the key is dropped)
+        if self._max_bytes is not None and size > self._max_bytes:
+            if node is not None:
+                self._drop(node)
+            return
+
+        if node is not None:
+            self._bytes += size - node.size
+            node.value = value
+            node.expires = expires
+            node.size = size
+            self._touch(node)
+
+            # the key was just written, so it is never the one evicted for its own growth
+            while self._max_bytes is not None and self._bytes > self._max_bytes:
+                self._evict(node)
+            return
+
+        # makes room before adding the key, so that a new key is never the one evicted
+        while (self._max_entries is not None and self._map.get_size() >= self._max_entries) or \
+                (self._max_bytes is not None and self._bytes + size > self._max_bytes):
+            self._evict()
+
+        node = CacheNode(key, value, hash_val, expires, size)
+        self._map._insert_node(node)
+        self._bytes += size
+        self._groups.link(node, self._first_group())
+
+    def remove(self, key: str) -> None:
+        """
+        Returns nothing. Given a key, removes it from the cache if it is there
+        """
+        node = self._find(key, self._hash_function(key))
+        if node is not None:
+            self._drop(node)
+
+    def clear(self) -> None:
+        """
+        Returns nothing. Empties the cache (the counters are kept)
+        """
+        self._map.clear()
+        self._bytes = 0
+        self._groups = CountGroups()
+
+    def keys(self):
+        """
+        Returns a generator over the cached keys, from the next to be evicted to the last
+        """
+        group = self._groups.lowest
+        while group is not None:
+            node = group.first
+            while node is not None:
+                yield node.key
+                node = node.newer
+            group = group.next
+
+    def _first_group(self) -> CountGroup:
+        """
+        Returns the group a new key goes into: the only group of an LRU cache, or the group for one use
+        """
+        lowest = self._groups.lowest
+        if lowest is None or (self._lfu and lowest.count != 1):
+            return self._groups.insert_group(1, None)
+        return lowest
+
+    def _touch(self, node: CacheNode) -> None:
+        """
+        Returns nothing. Marks a node as just used: it moves to the most recent end of its group (LRU),
+        or of the group for one more use (LFU)
+        """
+        group = node.group
+        if not self._lfu:
+            if group.last is not node:
+                self._groups.unlink(node)
+                self._groups.link(node, group)
+            return
+
+        target = group.next
+        if target is None or target.count != group.count + 1:
+            target = self._groups.insert_group(group.count + 1, group)
+        self._groups.unlink(node)
+        self._groups.link(node, target)
+
+    def _evict(self, keep: CacheNode = None) -> None:
+        """
+        Returns nothing. Drops the key at the front of the eviction order (or the one after it, if that is keep)
+        """
+        lowest = self._groups.lowest
+        victim = lowest.first
+        if victim is keep:
+            victim = keep.newer if keep.newer is not None else lowest.next.first
+
+        self._drop(victim)
+        self._stats.evictions += 1
+
+    def _drop(self, node: CacheNode) -> None:
+        """
+        Returns nothing. Takes a node out of the eviction order and out of the hash map
+        """
+        self._groups.unlink(node)
+        self._map._remove(node.key, node.hash)
+        self._bytes -= node.size
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+    from a6_include import hash_function_2
+
+    print("\nLRU cache")
+    print("---------")
+    cache = BoundedCache(hash_function_2, max_entries=3)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key.upper())
+    cache.get('a')
+    cache.put('d', 'D')
+    print(list(cache.keys()), cache.get('b'), cache.get('a'), cache.get_stats())
+
+    print("\nLFU cache")
+    print("---------")
+    cache = BoundedCache(hash_function_2, max_entries=3, policy='lfu')
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key.upper())
+    for _ in range(3):
+        cache.get('a')
+    cache.get('b')
+    cache.put('d', 'D')
+    cache.put('e', 'E')
+    print(list(cache.keys()), cache.contains_key('c'), cache.contains_key('a'), cache.get_stats())
+
+    print("\nmax_bytes and ttl")
+    print("-----------------")
+    now = [0.0]
+    cache = BoundedCache(hash_function_2, max_bytes=100, ttl=10, sizeof=len, clock=lambda: now[0])
+    for i in range(30):
+        cache.put('key' + str(i), 'v' * 10)
+    print(cache.get_size(), cache.get_bytes(), list(cache.keys())[:3])
+    cache.put('long', 'x' * 20, ttl=100)
+    now[0] = 50.0
+    print(cache.get('key29'), cache.get('long'), cache.get_size(), cache.get_stats())
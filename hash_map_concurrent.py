@@ -0,0 +1,258 @@
+# Description: A thread-safe HashMap built out of separate chaining HashMap segments with striped locks.
+#              Each key belongs to one segment (picked from the high bits of its mixed hash), and each segment
+#              has its own lock, so writers to different segments never wait on each other.
+#
+#              Reads take no lock. Every change a writer makes to a chain is a single reference assignment
+#              (a new node is fully built before it becomes the head of its chain, and a removed node is
+#              unlinked by pointing its predecessor past it), so a reader always walks a whole chain.
+#              A segment is never resized in place: the writer builds a larger copy of it next to the old one
+#              and then swaps it in, so readers keep using the old segment until then instead of waiting.
+
+
+import threading
+
+from a6_include import DynamicArray, HASH_MIX, MASK_64, hash_function_2
+from hash_map_sc import HashMap
+
+
+class ConcurrentHashMap:
+    def __init__(self, capacity: int, function, segments: int = 16, max_load: float = 1.0) -> None:
+        """
+        Initialize new ConcurrentHashMap, split into the given number of segments (a power of two), which
+        share the capacity between them. A segment doubles once its load rises above max_load
+        """
+        if segments < 1 or segments & (segments - 1) != 0:
+            raise ValueError("segments must be a power of two")
+        if max_load <= 0:
+            raise ValueError("max_load must be greater than 0")
+
+        self._hash_function = function
+        self._max_load = max_load
+        self._segment_bits = segments.bit_length() - 1
+
+        # the segments grow on their own (see _grow), so they are created without a max_load
+        segment_capacity = max(capacity // segments, 1)
+        self._segments = DynamicArray([HashMap(segment_capacity, function) for _ in range(segments)])
+        self._locks = DynamicArray([threading.Lock() for _ in range(segments)])
+
+    def __str__(self) -> str:
+        """
+        Override string method to provide more readable output
+        """
+        out = ''
+        for index in range(self._segments.length()):
+            out += 'segment ' + str(index) + ':\n' + str(self._segments[index])
+        return out
+
+    def _segment_index(self, hash_val: int) -> int:
+        """
+        Returns the index of the segment a hash belongs to. The high bits of the scrambled hash are used,
+        so the choice of segment doesn't follow the choice of bucket inside the segment
+        """
+        if self._segment_bits == 0:
+            return 0
+        return ((hash_val * HASH_MIX) & MASK_64) >> (64 - self._segment_bits)
+
+    def _grow(self, index: int) -> None:
+        """
+        Returns nothing. Replaces a segment with a copy of twice its capacity. Must be called holding its lock.
+        The copy reuses the cached hashes, and is only swapped in once it is complete
+        """
+        old = self._segments[index]
+        new = HashMap(old.get_capacity() * 2, self._hash_function)
+        new.update(old)
+        self._segments[index] = new
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Returns nothing. Adds a key with a value to the hash map, or updates the key if it already exists
+        """
+        # the key is hashed outside the lock, so the lock is only held for the chain walk
+        hash_val = self._hash_function(key)
+        index = self._segment_index(hash_val)
+
+        with self._locks[index]:
+            segment = self._segments[index]
+            segment._put(key, value, hash_val)
+            if segment.get_size() > self._max_load * segment.get_capacity():
+                self._grow(index)
+
+    def increment(self, key: str, amount: int = 1) -> int:
+        """
+        Adds amount to the (numeric) value of a key as one atomic step, or adds the key with a value of amount
+        if it doesn't exist. Returns the new value
+        """
+        hash_val = self._hash_function(key)
+        index = self._segment_index(hash_val)
+
+        with self._locks[index]:
+            segment = self._segments[index]
+            count = segment._increment(key, amount, hash_val)
+            if segment.get_size() > self._max_load * segment.get_capacity():
+                self._grow(index)
+        return count
+
+    def get(self, key: str) -> object:
+        """
+        Given a key, returns the value of that key if it is in the hash map. Otherwise, returns None.
+        Takes no lock
+        """
+        hash_val = self._hash_function(key)
+        return self._segments[self._segment_index(hash_val)]._get(key, hash_val)
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Given a key, returns True if the key is in the hash map (even if its value is None). Otherwise, returns False.
+        Takes no lock
+        """
+        hash_val = self._hash_function(key)
+        segment = self._segments[self._segment_index(hash_val)]
+        return segment.find_bucket(key, hash_val).contains(key, hash_val) is not None
+
+    def remove(self, key: str) -> None:
+        """
+        Returns nothing. Given a key, removes it from the hash map if it is there
+        """
+        hash_val = self._hash_function(key)
+        index = self._segment_index(hash_val)
+
+        with self._locks[index]:
+            self._segments[index]._remove(key, hash_val)
+
+    def get_size(self) -> int:
+        """
+        Returns the number of keys in the hash map. While other threads are writing, this is the sum of the
+        segments' sizes at slightly different moments
+        """
+        size = 0
+        for index in range(self._segments.length()):
+            size += self._segments[index].get_size()
+        return size
+
+    def get_capacity(self) -> int:
+        """
+        Returns the total capacity of the segments
+        """
+        capacity = 0
+        for index in range(self._segments.length()):
+            capacity += self._segments[index].get_capacity()
+        return capacity
+
+    def table_load(self) -> float:
+        """
+        Returns the current load of the table, the num of elements divided by the num of buckets (including empty)
+        """
+        return self.get_size() / self.get_capacity()
+
+    def clear(self) -> None:
+        """
+        Returns nothing. Clears every segment, one at a time
+        """
+        for index in range(self._segments.length()):
+            with self._locks[index]:
+                old = self._segments[index]
+                self._segments[index] = HashMap(old.get_capacity(), self._hash_function)
+
+    def items(self):
+        """
+        Returns a generator over the (key, value) pairs of the hash map. Each segment is copied under its lock
+        as the generator reaches it, so the pairs of a segment are consistent with each other, and writes to
+        segments not reached yet are seen
+        """
+        for index in range(self._segments.length()):
+            with self._locks[index]:
+                pairs = list(self._segments[index].items())
+            yield from pairs
+
+    def keys(self):
+        """
+        Returns a generator over the keys of the hash map (see items)
+        """
+        return (pair[0] for pair in self.items())
+
+    def values(self):
+        """
+        Returns a generator over the values of the hash map (see items)
+        """
+        return (pair[1] for pair in self.items())
+
+    def __iter__(self):
+        """
+        Iterates over the keys of the hash map
+        """
+        return self.keys()
+
+    def get_keys(self) -> DynamicArray:
+        """
+        Returns a DynamicArray created of all the keys in the hash map
+        """
+        return DynamicArray(list(self.keys()))
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from a6_include import hash_function_fnv1a
+
+    print("\nConcurrentHashMap basics")
+    print("------------------------")
+    m = ConcurrentHashMap(16, hash_function_2, segments=4)
+    for i in range(100):
+        m.put('key' + str(i), i)
+    m.remove('key0')
+    print(m.get_size(), m.get('key1'), m.get('key0'), m.contains_key('key99'), m.increment('key1', 10))
+
+    def stress(thread_count: int, ops: int) -> float:
+        """
+        Runs thread_count threads against one map and checks the result, returning the ops per second.
+        Each thread writes only its own keys, so its final keys are known, and reads every thread's keys,
+        checking that a value it finds always belongs to its key
+        """
+        shared = ConcurrentHashMap(16, hash_function_fnv1a)
+        expected = [None] * thread_count
+        errors = []
+
+        def worker(number: int) -> None:
+            rnd = random.Random(number)
+            own = {}
+            for op in range(ops):
+                key = str(number) + ':' + str(rnd.randint(0, 2000))
+                choice = rnd.random()
+                if choice < 0.4:
+                    shared.put(key, key + '=' + str(op))
+                    own[key] = key + '=' + str(op)
+                elif choice < 0.5:
+                    shared.remove(key)
+                    own.pop(key, None)
+                else:
+                    # reads a key of any thread, whose value must be missing or belong to it
+                    other = str(rnd.randrange(thread_count)) + ':' + str(rnd.randint(0, 2000))
+                    value = shared.get(other)
+                    if value is not None and not value.startswith(other + '='):
+                        errors.append((other, value))
+                    if key in own and shared.get(key) != own[key]:
+                        errors.append((key, shared.get(key), own[key]))
+            expected[number] = own
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(thread_count)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        final = {}
+        for own in expected:
+            final.update(own)
+        correct = not errors and dict(shared.items()) == final and shared.get_size() == len(final)
+        print(f"{thread_count} threads: {thread_count * ops / elapsed:,.0f} ops/s, correct: {correct}")
+        return thread_count * ops / elapsed
+
+    print("\nstress test")
+    print("-----------")
+    for thread_count in (1, 2, 4, 8):
+        stress(thread_count, 50000)
@@ -0,0 +1,321 @@
+# Description: A separate chaining HashMap whose chains live in flat arrays instead of LinkedLists of SLNodes.
+#              A bucket is just the slot index of the first entry of its chain (in an array of machine integers),
+#              and every entry is a slot of four parallel arrays: key, value, cached hash and the slot of the
+#              next entry in its chain. Empty buckets cost 8 bytes instead of a LinkedList object, an entry costs
+#              no object of its own, and walking a chain reads integers out of contiguous arrays.
+#
+#              Removed slots are kept on a free list (chained through the next array) and reused by later puts.
+#              The bucket array is only allocated by the first put, and the entry arrays grow as keys are added.
+
+
+from array import array
+
+from a6_include import DynamicArray, MASK_64, hash_function_1, hash_function_2
+
+
+# slot index that ends a chain (or marks an empty bucket)
+NO_SLOT = -1
+
+# key of a slot that is on the free list
+_FREE = object()
+
+
+class FlatHashMap:
+    def __init__(self, capacity: int, function, max_load: float = None) -> None:
+        """
+        Initialize new FlatHashMap that uses separate chaining for collision resolution, with the chains kept
+        in flat arrays. When max_load is given, put doubles the capacity once the load rises above it
+        """
+        if max_load is not None and max_load <= 0:
+            raise ValueError("max_load must be greater than 0")
+
+        self._capacity = capacity
+        self._hash_function = function
+        self._max_load = max_load
+        self._size = 0
+
+        # counts the changes that add, remove or move keys, so that an iteration can tell the map changed under it
+        self._mod_count = 0
+
+        # first slot of each bucket's chain, allocated by the first put
+        self._heads = None
+
+        # the entry slots, as parallel arrays
+        self._keys = DynamicArray()
+        self._values = DynamicArray()
+        self._hashes = array('Q')
+        self._next = array('q')
+
+        # first slot of the free list
+        self._free = NO_SLOT
+
+    def __str__(self) -> str:
+        """
+        Override string method to provide more readable output, in the same form as the chaining HashMap
+        """
+        out = ''
+        for index in range(self._capacity):
+            content = ''
+            slot = self._heads[index] if self._heads is not None else NO_SLOT
+            while slot != NO_SLOT:
+                content += (' -> ' if content else '') + '(' + str(self._keys[slot]) + ': ' + \
+                           str(self._values[slot]) + ')'
+                slot = self._next[slot]
+            out += str(index) + ': SLL [' + content + ']\n'
+        return out
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return self._size
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of map
+        """
+        return self._capacity
+
+    # ------------------------------------------------------------------ #
+
+    def _hash(self, key: str) -> int:
+        """
+        Returns the hash of a key, kept to 64 bits so that it fits in the hash array
+        """
+        return self._hash_function(key) & MASK_64
+
+    def _find(self, key: str, hash_val: int) -> int:
+        """
+        Returns the slot holding a key (with the given hash), or NO_SLOT if the key is not in the hash map
+        """
+        if self._heads is None:
+            return NO_SLOT
+
+        keys, hashes, next_slots = self._keys, self._hashes, self._next
+        slot = self._heads[hash_val % self._capacity]
+
+        # the cached hashes are compared before the keys
+        while slot != NO_SLOT:
+            if hashes[slot] == hash_val and keys[slot] == key:
+                return slot
+            slot = next_slots[slot]
+        return NO_SLOT
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Returns nothing. Adds a key with a value to the hash map, or updates the key if it already exists
+        """
+        hash_val = self._hash(key)
+
+        # if the key already exists, its value is replaced in its slot
+        slot = self._find(key, hash_val)
+        if slot != NO_SLOT:
+            self._values[slot] = value
+            return
+
+        if self._heads is None:
+            self._heads = array('q', [NO_SLOT]) * self._capacity
+
+        # takes a slot off the free list, or adds one at the end of the entry arrays
+        if self._free != NO_SLOT:
+            slot = self._free
+            self._free = self._next[slot]
+            self._keys[slot] = key
+            self._values[slot] = value
+            self._hashes[slot] = hash_val
+        else:
+            slot = len(self._next)
+            self._keys.append(key)
+            self._values.append(value)
+            self._hashes.append(hash_val)
+            self._next.append(NO_SLOT)
+
+        # the new slot becomes the head of its bucket's chain
+        bucket = hash_val % self._capacity
+        self._next[slot] = self._heads[bucket]
+        self._heads[bucket] = slot
+        self._size += 1
+        self._mod_count += 1
+
+        # if the load factor has grown past the threshold, doubles the table (thus reducing the load factor)
+        if self._max_load is not None and self._size > self._max_load * self._capacity:
+            self.resize_table(self._capacity * 2)
+
+    def get(self, key: str) -> object:
+        """
+        Given a key, returns the value of that key if it is in the hash map. Otherwise, returns None
+        """
+        slot = self._find(key, self._hash(key))
+        if slot == NO_SLOT:
+            return None
+        return self._values[slot]
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Given a key, returns True if the key is in the hash map (even if its value is None). Otherwise, returns False
+        """
+        return self._find(key, self._hash(key)) != NO_SLOT
+
+    def remove(self, key: str) -> None:
+        """
+        Returns nothing. Given a key, unlinks its slot from its chain and puts the slot on the free list
+        """
+        if self._size == 0:
+            return
+
+        hash_val = self._hash(key)
+        keys, hashes, next_slots = self._keys, self._hashes, self._next
+        bucket = hash_val % self._capacity
+        previous = NO_SLOT
+        slot = self._heads[bucket]
+
+        while slot != NO_SLOT:
+            if hashes[slot] == hash_val and keys[slot] == key:
+                # points the previous slot (or the bucket) past the removed slot
+                if previous == NO_SLOT:
+                    self._heads[bucket] = next_slots[slot]
+                else:
+                    next_slots[previous] = next_slots[slot]
+
+                # lets go of the key and value, and puts the slot at the front of the free list
+                keys[slot] = _FREE
+                self._values[slot] = None
+                next_slots[slot] = self._free
+                self._free = slot
+
+                self._size -= 1
+                self._mod_count += 1
+                return
+
+            previous = slot
+            slot = next_slots[slot]
+
+    def empty_buckets(self) -> int:
+        """
+        Returns the quantity of buckets that are empty
+        """
+        if self._heads is None:
+            return self._capacity
+        return self._heads.count(NO_SLOT)
+
+    def table_load(self) -> float:
+        """
+        Returns the current load of the table, the num of elements divided by the num of buckets (including empty)
+        """
+        return self._size / self._capacity
+
+    def clear(self) -> None:
+        """
+        Returns nothing. Clears the hash map, letting go of the bucket and entry arrays
+        """
+        self._heads = None
+        self._keys = DynamicArray()
+        self._values = DynamicArray()
+        self._hashes = array('Q')
+        self._next = array('q')
+        self._free = NO_SLOT
+        self._size = 0
+        self._mod_count += 1
+
+    def resize_table(self, new_capacity: int) -> None:
+        """
+        Returns nothing. Given a new capacity, rebuilds the bucket array and relinks every entry into it by
+        its cached hash. The entries stay in their slots, only the chain links change
+        """
+        if new_capacity < 1:
+            return
+
+        self._capacity = new_capacity
+        self._mod_count += 1
+        if self._heads is None:
+            return
+
+        heads = array('q', [NO_SLOT]) * new_capacity
+        keys, hashes, next_slots = self._keys, self._hashes, self._next
+
+        # slots on the free list keep their links, so the free list stays intact
+        for slot in range(len(next_slots)):
+            if keys[slot] is not _FREE:
+                bucket = hashes[slot] % new_capacity
+                next_slots[slot] = heads[bucket]
+                heads[bucket] = slot
+
+        self._heads = heads
+
+    def _entries(self):
+        """
+        Yields a (key, value) tuple for every key in the hash map, in slot order.
+        Raises a RuntimeError if a key is added or removed (or the table resized) while it is iterating
+        """
+        mod_count = self._mod_count
+        keys, values = self._keys, self._values
+
+        for slot in range(keys.length()):
+            if keys[slot] is not _FREE:
+                yield keys[slot], values[slot]
+                if self._mod_count != mod_count:
+                    raise RuntimeError("HashMap changed during iteration")
+
+    def keys(self):
+        """
+        Returns a generator over the keys of the hash map
+        """
+        return (entry[0] for entry in self._entries())
+
+    def values(self):
+        """
+        Returns a generator over the values of the hash map
+        """
+        return (entry[1] for entry in self._entries())
+
+    def items(self):
+        """
+        Returns a generator over the (key, value) pairs of the hash map
+        """
+        return self._entries()
+
+    def __iter__(self):
+        """
+        Iterates over the keys of the hash map
+        """
+        return self.keys()
+
+    def get_keys(self) -> DynamicArray:
+        """
+        Returns a DynamicArray created of all the keys in the hash map
+        """
+        return DynamicArray(list(self.keys()))
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nPDF - put example 1")
+    print("-------------------")
+    m = FlatHashMap(50, hash_function_1)
+    for i in range(150):
+        m.put('str' + str(i), i * 100)
+        if i % 25 == 24:
+            print(m.empty_buckets(), m.table_load(), m.get_size(), m.get_capacity())
+
+    print("\nremove and reuse slots")
+    print("----------------------")
+    m = FlatHashMap(10, hash_function_2, max_load=1.0)
+    for i in range(100):
+        m.put('key' + str(i), i)
+    for i in range(0, 100, 2):
+        m.remove('key' + str(i))
+    slots = len(m._next)
+    for i in range(50):
+        m.put('new' + str(i), i)
+    print(m.get_size(), m.get_capacity(), slots, len(m._next), m.get('key1'), m.get('key2'), m.get('new49'))
+
+    print("\nresize")
+    print("------")
+    m = FlatHashMap(4, hash_function_1)
+    for i in range(8):
+        m.put(str(i), i * 10)
+    m.resize_table(3)
+    print(m)
+    print(sorted(m.items()))
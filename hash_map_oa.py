@@ -5,26 +5,506 @@
 # Due Date: 06/03/22
 # Description: An implementation of a hash map through a pre-created dynamic array class using open addressing.
 #              Includes various methods to modify the hash map, without using built-in Python data structures.
+#              The slots are kept either as HashEntry objects or, in compact mode, as parallel arrays.
 
 
-from a6_include import (DynamicArray, HashEntry,
-                        hash_function_1, hash_function_2)
+from array import array
+from math import gcd
+from time import perf_counter
+
+from a6_include import (DynamicArray, HashEntry, HashMapStats, CAPACITY_POLICIES, HASH_MIX, grow_capacity,
+                        hash_many, make_resolver, round_capacity, to_list, hash_function_1, hash_function_2)
+
+
+# states of a slot in a table
+EMPTY = 0
+LIVE = 1
+TOMBSTONE = 2
+
+# hashes are kept to 64 bits, so that they fit in the compact table's hash array
+HASH_MASK = (1 << 64) - 1
+
+# returned by lookups for a missing key, so that a stored None value is not mistaken for a missing key
+_NOT_FOUND = object()
+
+# tombstone shared by every slot an incremental resize has moved out of an EntryTable (see release)
+_RELEASED = HashEntry(None, None, 0)
+_RELEASED.is_tombstone = True
+
+
+class SlotTable:
+    """
+    Base class of the tables. Its find_slot works through the state, hash_at and key_at of the table,
+    and tables that can read their slots more directly override it
+    """
+
+    def find_slot(self, key: str, hash_val: int, capacity: int, probing: "ProbingStrategy") -> tuple:
+        """
+        Probe the table once for a key (and its hash). Return a tuple with the index of the live slot holding
+        the key (or -1 if it is not there), the index of the first free slot (tombstone or empty) in the probe
+        sequence (or -1 if there is none), and the number of slots looked at
+        """
+        robin_hood = probing.robin_hood
+        free = -1
+        step = 0
+
+        # no probe sequence needs more than capacity probes, so the search stops there at the latest
+        for index in probing.sequence(hash_val, capacity):
+            state = self.state(index)
+
+            # an empty slot ends the probe sequence, the key is not in the table
+            if state == EMPTY:
+                return -1, index if free < 0 else free, step + 1
+
+            # the cached hashes are compared before the keys
+            if state == LIVE:
+                if self.hash_at(index) == hash_val and self.key_at(index) == key:
+                    return index, free, step + 1
+
+                # in a Robin Hood table, an entry closer to its home than the key would be means the key is not there
+                if robin_hood and (index - self.hash_at(index)) % capacity < step:
+                    return -1, free, step + 1
+            elif free < 0:
+                free = index
+
+            step += 1
+
+        return -1, free, capacity
+
+
+class EntryTable(SlotTable):
+    """
+    Table of slots that keeps one HashEntry object per used slot (and None for empty slots)
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize a table with the given number of empty slots."""
+        self._entries = DynamicArray([None] * capacity)
+
+    def __getitem__(self, index: int) -> HashEntry:
+        """Return the entry at the given slot, or None if the slot is empty."""
+        return self._entries[index]
+
+    def length(self) -> int:
+        """Return the number of slots in the table."""
+        return self._entries.length()
+
+    def extend(self, count: int) -> None:
+        """Add count empty slots at the end of the table."""
+        for _ in range(count):
+            self._entries.append(None)
+
+    def state(self, index: int) -> int:
+        """Return whether the slot is EMPTY, LIVE or a TOMBSTONE."""
+        entry = self._entries[index]
+        if entry is None:
+            return EMPTY
+        return TOMBSTONE if entry.is_tombstone else LIVE
+
+    def hash_at(self, index: int) -> int:
+        """Return the cached hash of the key in a used slot."""
+        return self._entries[index].hash
+
+    def key_at(self, index: int) -> str:
+        """Return the key in a used slot."""
+        return self._entries[index].key
+
+    def value_at(self, index: int) -> object:
+        """Return the value in a used slot."""
+        return self._entries[index].value
+
+    def set_value(self, index: int, value: object) -> None:
+        """Replace the value in a live slot."""
+        self._entries[index].value = value
+
+    def store(self, index: int, key: str, value: object, hash_val: int) -> None:
+        """Make the slot live with the given key, value and hash."""
+        self._entries[index] = HashEntry(key, value, hash_val)
+
+    def make_tombstone(self, index: int) -> None:
+        """Turn a live slot into a tombstone."""
+        self._entries[index].is_tombstone = True
+
+    def release(self, index: int) -> None:
+        """Turn a live slot into a tombstone that holds nothing, letting go of its entry."""
+        self._entries[index] = _RELEASED
+
+    def move(self, source: int, destination: int) -> None:
+        """Copy the contents of one slot into another."""
+        self._entries[destination] = self._entries[source]
+
+    def set_empty(self, index: int) -> None:
+        """Make the slot empty."""
+        self._entries[index] = None
+
+    def find_slot(self, key: str, hash_val: int, capacity: int, probing: "ProbingStrategy") -> tuple:
+        """
+        Probe the table once for a key, like SlotTable.find_slot, reading each entry once per probe
+        """
+        increments = probing.increments(hash_val, capacity)
+        if increments is None:
+            return super().find_slot(key, hash_val, capacity, probing)
+
+        # the next index is worked out inline, as index + stride + growth * step
+        stride, growth = increments
+        robin_hood = probing.robin_hood
+        entry_at = self._entries.get_at_index
+        index = hash_val % capacity
+        free = -1
+        step = 0
+
+        while step < capacity:
+            entry = entry_at(index)
+            if entry is None:
+                return -1, index if free < 0 else free, step + 1
+
+            if entry.is_tombstone:
+                if free < 0:
+                    free = index
+            elif entry.hash == hash_val and entry.key == key:
+                return index, free, step + 1
+            elif robin_hood and (index - entry.hash) % capacity < step:
+                return -1, free, step + 1
+
+            step += 1
+            index = (index + stride + growth * step) % capacity
+
+        return -1, free, capacity
+
+    def insert_all(self, old: "EntryTable", probing: "ProbingStrategy", capacity: int) -> int:
+        """
+        Move the live entries of another EntryTable into this empty table, and return how many there were
+        (or -1 if the probe sequence of some entry reached no empty slot within capacity probes).
+        The keys are known to be unique, so each entry object goes as it is into the first empty slot
+        that the probing's sequence reaches with its cached hash
+        """
+        entries = self._entries
+        old_entries = old._entries
+        count = 0
+
+        for index in range(old_entries.length()):
+            entry = old_entries[index]
+            if entry is None or entry.is_tombstone:
+                continue
+
+            for slot in probing.sequence(entry.hash, capacity):
+                if entries[slot] is None:
+                    break
+            else:
+                return -1
+            entries[slot] = entry
+            count += 1
+
+        return count
+
+
+class CompactTable(SlotTable):
+    """
+    Table of slots kept as parallel arrays: keys, values, 64-bit hashes and a byte of state per slot,
+    so no object is allocated per entry
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize a table with the given number of empty slots."""
+        self._keys = DynamicArray([None] * capacity)
+        self._values = DynamicArray([None] * capacity)
+        self._hashes = array('Q', bytes(8 * capacity))
+        self._states = bytearray(capacity)
+
+    def __getitem__(self, index: int) -> HashEntry:
+        """Return a HashEntry copy of the given slot, or None if the slot is empty."""
+        if self._states[index] == EMPTY:
+            return None
+
+        entry = HashEntry(self._keys[index], self._values[index], self._hashes[index])
+        entry.is_tombstone = self._states[index] == TOMBSTONE
+        return entry
+
+    def length(self) -> int:
+        """Return the number of slots in the table."""
+        return len(self._states)
+
+    def extend(self, count: int) -> None:
+        """Add count empty slots at the end of the table."""
+        for _ in range(count):
+            self._keys.append(None)
+            self._values.append(None)
+        self._hashes.frombytes(bytes(8 * count))
+        self._states += bytes(count)
+
+    def state(self, index: int) -> int:
+        """Return whether the slot is EMPTY, LIVE or a TOMBSTONE."""
+        return self._states[index]
+
+    def hash_at(self, index: int) -> int:
+        """Return the cached hash of the key in a used slot."""
+        return self._hashes[index]
+
+    def key_at(self, index: int) -> str:
+        """Return the key in a used slot."""
+        return self._keys[index]
+
+    def value_at(self, index: int) -> object:
+        """Return the value in a used slot."""
+        return self._values[index]
+
+    def set_value(self, index: int, value: object) -> None:
+        """Replace the value in a live slot."""
+        self._values[index] = value
+
+    def store(self, index: int, key: str, value: object, hash_val: int) -> None:
+        """Make the slot live with the given key, value and hash."""
+        self._keys[index] = key
+        self._values[index] = value
+        self._hashes[index] = hash_val
+        self._states[index] = LIVE
+
+    def make_tombstone(self, index: int) -> None:
+        """Turn a live slot into a tombstone, letting go of its value (the key stays for probing)."""
+        self._values[index] = None
+        self._states[index] = TOMBSTONE
+
+    def release(self, index: int) -> None:
+        """Turn a live slot into a tombstone that holds nothing, letting go of its key and value."""
+        self._keys[index] = None
+        self._values[index] = None
+        self._states[index] = TOMBSTONE
+
+    def move(self, source: int, destination: int) -> None:
+        """Copy the contents of one slot into another."""
+        self._keys[destination] = self._keys[source]
+        self._values[destination] = self._values[source]
+        self._hashes[destination] = self._hashes[source]
+        self._states[destination] = self._states[source]
+
+    def set_empty(self, index: int) -> None:
+        """Make the slot empty."""
+        self._keys[index] = None
+        self._values[index] = None
+        self._states[index] = EMPTY
+
+    def find_slot(self, key: str, hash_val: int, capacity: int, probing: "ProbingStrategy") -> tuple:
+        """
+        Probe the table once for a key, like SlotTable.find_slot, reading the state and hash arrays directly
+        """
+        increments = probing.increments(hash_val, capacity)
+        if increments is None:
+            return super().find_slot(key, hash_val, capacity, probing)
+
+        # the next index is worked out inline, as index + stride + growth * step
+        stride, growth = increments
+        robin_hood = probing.robin_hood
+        states, hashes, key_at = self._states, self._hashes, self._keys.get_at_index
+        index = hash_val % capacity
+        free = -1
+        step = 0
+
+        while step < capacity:
+            state = states[index]
+            if state == EMPTY:
+                return -1, index if free < 0 else free, step + 1
+
+            if state == LIVE:
+                if hashes[index] == hash_val and key_at(index) == key:
+                    return index, free, step + 1
+                if robin_hood and (index - hashes[index]) % capacity < step:
+                    return -1, free, step + 1
+            elif free < 0:
+                free = index
+
+            step += 1
+            index = (index + stride + growth * step) % capacity
+
+        return -1, free, capacity
+
+    def insert_all(self, old: "CompactTable", probing: "ProbingStrategy", capacity: int) -> int:
+        """
+        Copy the live slots of another CompactTable into this empty table, and return how many there were
+        (or -1 if the probe sequence of some key reached no empty slot within capacity probes).
+        The keys are known to be unique, so each one goes into the first empty slot that
+        the probing's sequence reaches with its cached hash
+        """
+        keys, values, hashes, states = self._keys, self._values, self._hashes, self._states
+        old_keys, old_values, old_hashes, old_states = old._keys, old._values, old._hashes, old._states
+        count = 0
+
+        for index in range(len(old_states)):
+            if old_states[index] != LIVE:
+                continue
+
+            hash_val = old_hashes[index]
+            for slot in probing.sequence(hash_val, capacity):
+                if states[slot] == EMPTY:
+                    break
+            else:
+                return -1
+
+            keys[slot] = old_keys[index]
+            values[slot] = old_values[index]
+            hashes[slot] = hash_val
+            states[slot] = LIVE
+            count += 1
+
+        return count
+
+
+class ProbingStrategy:
+    """
+    Base class for the ways the map walks the table to resolve collisions.
+    probe returns the slot looked at on a given step for a hash, step 0 being the hash's home slot.
+    A strategy whose sequence starts at hash % capacity and moves on by stride + growth * step slots on each step
+    also returns (stride, growth) from increments, so that lookups can work the sequence out inline
+    """
+
+    # Robin Hood maps order each probe sequence by distance from home, and delete by shifting entries back
+    robin_hood = False
+
+    def probe(self, hash_val: int, step: int, capacity: int) -> int:
+        """Return the index probed on the given step."""
+        raise NotImplementedError
+
+    def increments(self, hash_val: int, capacity: int) -> tuple:
+        """Return the (stride, growth) of the probe sequence of a hash, or None if it doesn't have that form."""
+        return None
+
+    def sequence(self, hash_val: int, capacity: int):
+        """Yield the capacity indices probed for a hash, in order."""
+        increments = self.increments(hash_val, capacity)
+        if increments is None:
+            for step in range(capacity):
+                yield self.probe(hash_val, step, capacity)
+            return
+
+        stride, growth = increments
+        index = hash_val % capacity
+        for step in range(1, capacity + 1):
+            yield index
+            index = (index + stride + growth * step) % capacity
+
+
+class LinearProbing(ProbingStrategy):
+    """
+    Probes the slots right after the home slot, one at a time
+    """
+
+    def probe(self, hash_val: int, step: int, capacity: int) -> int:
+        """Return the index probed on the given step."""
+        return (hash_val + step) % capacity
+
+    def increments(self, hash_val: int, capacity: int) -> tuple:
+        """Return the (stride, growth) of the probe sequence of a hash."""
+        return 1, 0
+
+
+class QuadraticProbing(ProbingStrategy):
+    """
+    Probes home + step ** 2. On power of two capacities home + step * (step + 1) / 2 (the triangular numbers)
+    is used instead, since that sequence visits every slot, while the squares only reach a few of them.
+    On prime capacities the first (capacity + 1) / 2 squares all land on different slots, so while the table is
+    less than half full (which the map keeps it) the squares always reach a free slot
+    """
+
+    def probe(self, hash_val: int, step: int, capacity: int) -> int:
+        """Return the index probed on the given step."""
+        if capacity & (capacity - 1) == 0:
+            return (hash_val + step * (step + 1) // 2) & (capacity - 1)
+        return (hash_val + step * step) % capacity
+
+    def increments(self, hash_val: int, capacity: int) -> tuple:
+        """Return the (stride, growth) of the probe sequence of a hash."""
+        # consecutive triangular numbers are step apart, and consecutive squares 2 * step - 1
+        if capacity & (capacity - 1) == 0:
+            return 0, 1
+        return -1, 2
+
+
+class DoubleHashing(ProbingStrategy):
+    """
+    Probes home + step * stride, where the stride is taken from a scrambled copy of the hash,
+    so keys that share a home slot still follow different sequences.
+    The stride is moved up to the next value that shares no factor with the capacity, so every slot is visited
+    """
+
+    def probe(self, hash_val: int, step: int, capacity: int) -> int:
+        """Return the index probed on the given step."""
+        if step == 0 or capacity < 2:
+            return hash_val % capacity
+        return (hash_val + step * self._stride(hash_val, capacity)) % capacity
+
+    def increments(self, hash_val: int, capacity: int) -> tuple:
+        """Return the (stride, growth) of the probe sequence of a hash, working the stride out once."""
+        if capacity < 2:
+            return 0, 0
+        return self._stride(hash_val, capacity), 0
+
+    def _stride(self, hash_val: int, capacity: int) -> int:
+        """Return the distance between the slots probed for a hash."""
+        stride = 1 + (((hash_val * HASH_MIX) & HASH_MASK) >> 32) % (capacity - 1)
+        while gcd(stride, capacity) != 1:
+            stride += 1
+        return stride
+
+
+class RobinHoodProbing(LinearProbing):
+    """
+    Linear probing where an inserted key takes the slot of any entry that is closer to its own home,
+    and removals shift the following entries back instead of leaving tombstones
+    """
+
+    robin_hood = True
 
 
 class HashMap:
-    def __init__(self, capacity: int, function) -> None:
+    def __init__(self, capacity: int, function, migrate_step: int = None, compact: bool = False,
+                 probing: ProbingStrategy = None, stats: bool = False, capacity_policy: str = None,
+                 expected: int = None) -> None:
         """
         Initialize new HashMap that uses
-        quadratic probing for collision resolution
-        DO NOT CHANGE THIS METHOD IN ANY WAY
+        quadratic probing for collision resolution, unless another ProbingStrategy is given
+
+        When migrate_step is given, the automatic resize in put is done incrementally: the old and new arrays
+        coexist, and each following put/get/remove moves migrate_step old slots into the new array
+
+        When compact is True, the slots are kept in a CompactTable instead of as HashEntry objects
+
+        When stats is True, the map keeps a HashMapStats of its operations, probe lengths and resizes (see get_stats)
+
+        capacity_policy rounds every capacity the map takes: None keeps capacities as asked for, 'pow2' rounds
+        them up to a power of two (where quadratic probing visits every slot), and 'prime' rounds them up to a
+        prime of a precomputed table (where quadratic probing always finds a free slot in a table less than half
+        full). When expected is given, the table starts out big enough for that many keys (see reserve)
         """
-        self._buckets = DynamicArray()
-        for _ in range(capacity):
-            self._buckets.append(None)
+        if migrate_step is not None and migrate_step < 1:
+            raise ValueError("migrate_step must be at least 1")
+        if capacity_policy not in CAPACITY_POLICIES:
+            raise ValueError("capacity_policy must be None, 'pow2' or 'prime'")
+
+        self._capacity_policy = capacity_policy
+        capacity = round_capacity(capacity, capacity_policy)
+
+        self._table_class = CompactTable if compact else EntryTable
+        self._buckets = self._table_class(capacity)
+        self._probing = probing if probing is not None else QuadraticProbing()
 
         self._capacity = capacity
         self._hash_function = function
         self._size = 0
+        self._tombstones = 0
+
+        # counts the changes that add, remove or move keys, so that an iteration can tell the map changed under it
+        self._mod_count = 0
+
+        # state of an in-progress incremental resize
+        self._migrate_step = migrate_step
+        self._old_buckets = None
+        self._old_capacity = 0
+        self._migrate_index = 0
+
+        # counters are only kept when asked for, so that a map without them pays a single check per operation
+        self._stats = HashMapStats() if stats else None
+
+        if expected is not None:
+            self.reserve(expected)
 
     def __str__(self) -> str:
         """
@@ -52,55 +532,79 @@ class HashMap:
 
     # ------------------------------------------------------------------ #
 
+    def _hash(self, key: str) -> int:
+        """
+        Returns the hash of a key, kept to 64 bits
+        """
+        return self._hash_function(key) & HASH_MASK
+
     def put(self, key: str, value: object) -> None:
         """
         Returns nothing. Adds a key with a value to the hash map, or updates the key if it already exists
         """
+        if self._stats is not None:
+            self._stats.puts += 1
+        self._put(key, value, self._hash(key))
+
+    def _put(self, key: str, value: object, hash_val: int, resolve=None) -> None:
+        """
+        Returns nothing. Does the work of put for a key whose hash has already been calculated.
+        If resolve is given and the key exists, its value becomes resolve(old value, value)
+        """
         # remember, if the load factor is greater than or equal to 0.5,
         # resize the table before putting the new key/value pair
 
-        # if the load factor is too big, adds more space to the array (thus reducing the load factor)
-        if self.table_load() >= 0.5:
-            self.resize_table(self._capacity * 2)
+        # if a resize is in progress, moves a few more old slots over first
+        if self._old_buckets is not None:
+            self._migrate_buckets(self._migrate_step)
 
-        # finds the appropriate index using the hash function
-        hash_val = self._hash_function(key)
-        index = hash_val % self._capacity
-
-        # if there is no key at that index, adds the new entry to the array
-        if self._buckets[index] is None:
-            self._buckets[index] = HashEntry(key, value)
-            self._size += 1
+        # if the load factor is too big, adds more space to the array (thus reducing the load factor)
+        # tombstones take up slots that have to be probed through, so they count toward the load here
+        if (self._size + self._tombstones) / self._capacity >= 0.5:
+            # if most of the used slots are tombstones, purging them at the same capacity is enough
+            if self._tombstones > self._size:
+                self._start_resize(self._capacity)
+            else:
+                self._start_resize(grow_capacity(self._capacity, self._capacity_policy))
+
+        # probes once for the key, remembering the first free slot along the way
+        table = self._buckets
+        index, free = self._find_slot(table, self._capacity, key, hash_val)
+
+        # if the key does exist, updates the value
+        if index >= 0:
+            table.set_value(index, value if resolve is None else resolve(table.value_at(index), value))
             return
 
-        # establishes variables for probing
-        to_square = 0
-        new_index = index
-
-        # searches the next indices to see if the key already exists
-        while self._buckets[new_index] is not None:
-            # if the key does exist, updates the value
-            if self._buckets[new_index].key == key:
-                self._buckets[new_index].value = value
-                # if the key was a tombstone, updates the tombstone value and adds to the size
-                if self._buckets[new_index].is_tombstone:
-                    self._buckets[new_index].is_tombstone = False
-                    self._size += 1
+        # while a resize is in progress, a key that has not been migrated yet is updated where it is
+        if self._old_buckets is not None:
+            old_table = self._old_buckets
+            old_index, _ = self._find_slot(old_table, self._old_capacity, key, hash_val)
+            if old_index >= 0:
+                old_table.set_value(old_index, value if resolve is None else resolve(old_table.value_at(old_index),
+                                                                                     value))
                 return
 
-            # if the next value is a tombstone value, that tombstone is replaced
-            if self._buckets[new_index].is_tombstone:
-                self._buckets[new_index] = HashEntry(key, value)
-                self._size += 1
-                return
+        # a Robin Hood insert may move other entries along, so it has its own insert path
+        if self._probing.robin_hood:
+            self._robin_hood_store(table, self._capacity, key, value, hash_val)
+            self._size += 1
+            self._mod_count += 1
+            return
 
-            # if the current key is not the target key, moves to next index
-            to_square += 1
-            new_index = (index + to_square ** 2) % self._capacity
+        # if the probe sequence went round without reaching a free slot, makes more space and tries again
+        if free < 0:
+            self.resize_table(grow_capacity(self._capacity, self._capacity_policy))
+            self._put(key, value, hash_val)
+            return
 
-        # if the key doesn't already exist, adds it to the probed index
-        self._buckets[new_index] = HashEntry(key, value)
+        # if the key doesn't already exist, adds it (along with its hash) to the first free slot,
+        # reusing a tombstone if one was passed
+        if table.state(free) == TOMBSTONE:
+            self._tombstones -= 1
+        table.store(free, key, value, hash_val)
         self._size += 1
+        self._mod_count += 1
 
     def table_load(self) -> float:
         """
@@ -110,9 +614,217 @@ class HashMap:
 
     def empty_buckets(self) -> int:
         """
-        Returns the quantity of array slots that are empty
+        Returns the quantity of array slots that are empty (neither holding an element nor a tombstone)
         """
-        return self._capacity - self._size
+        return self._capacity - self._size - self._tombstones
+
+    def get_tombstones(self) -> int:
+        """
+        Returns the quantity of array slots that hold a tombstone
+        """
+        return self._tombstones
+
+    def tombstone_ratio(self) -> float:
+        """
+        Returns the share of the used (non-empty) slots that are tombstones
+        """
+        if self._size + self._tombstones == 0:
+            return 0.0
+        return self._tombstones / (self._size + self._tombstones)
+
+    def get_stats(self) -> HashMapStats:
+        """
+        Returns the map's HashMapStats (with the current tombstone count), or None if it was created without stats
+        """
+        if self._stats is not None:
+            self._stats.tombstones = self._tombstones
+        return self._stats
+
+    def purge_tombstones(self) -> None:
+        """
+        Returns nothing. Rebuilds the table at its current capacity, leaving out all the tombstones
+        """
+        if self._tombstones > 0:
+            self.resize_table(self._capacity)
+
+    def _start_resize(self, new_capacity: int, table=None) -> None:
+        """
+        Returns nothing. Resizes the table to the new capacity, either all at once or, if migrate_step was given,
+        by setting up a new array that the old slots are moved into a few at a time.
+        table can be a prebuilt empty table (of the map's table class) of new_capacity slots to use as the new array
+        """
+        new_capacity = round_capacity(new_capacity, self._capacity_policy)
+        if table is not None and table.length() != new_capacity:
+            raise ValueError("table must have one slot for each of the " + str(new_capacity) + " new slots")
+        if self._migrate_step is None:
+            self.resize_table(new_capacity)
+            return
+
+        # a resize that is still running is finished before the next one starts
+        self._finish_resize()
+        if self._stats is not None:
+            self._stats.resizes += 1
+
+        self._old_buckets = self._buckets
+        self._old_capacity = self._capacity
+        self._migrate_index = 0
+        self._mod_count += 1
+
+        self._capacity = new_capacity
+        self._buckets = table if table is not None else self._table_class(new_capacity)
+        self._tombstones = 0
+
+    def _migrate_buckets(self, count: int) -> None:
+        """
+        Returns nothing. Moves the live entries of up to count old slots into the new array
+        """
+        start = perf_counter() if self._stats is not None else 0.0
+        old_table, table = self._old_buckets, self._buckets
+        stop = min(self._migrate_index + count, self._old_capacity)
+
+        for index in range(self._migrate_index, stop):
+            if old_table.state(index) == LIVE:
+                # the keys are unique, so the entry goes in the first free (empty or tombstone) slot it probes
+                # the cached hash is used, so the key is not hashed again
+                if not self._store_new(table, self._capacity, old_table.key_at(index), old_table.value_at(index),
+                                       old_table.hash_at(index)):
+                    # the new array's probing can't place the key, so both arrays go into a bigger one at once
+                    self._old_buckets = None
+                    self._old_capacity = 0
+                    self._migrate_index = 0
+                    self._rebuild((table, old_table), grow_capacity(self._capacity, self._capacity_policy))
+                    return
+
+                # the old slot becomes a tombstone so that probing through the old array still works.
+                # It lets go of the old entry right away, so the old entries are freed a step at a time
+                # instead of all at once when the old array goes
+                old_table.release(index)
+
+        self._migrate_index = stop
+
+        # once every old slot is moved, the old array is let go
+        if self._migrate_index == self._old_capacity:
+            self._old_buckets = None
+            self._old_capacity = 0
+            self._migrate_index = 0
+
+        if self._stats is not None:
+            self._stats.resize_time += perf_counter() - start
+
+    def _finish_resize(self) -> None:
+        """
+        Returns nothing. Moves all the remaining old slots, if a resize is in progress
+        """
+        if self._old_buckets is not None:
+            self._migrate_buckets(self._old_capacity)
+
+    def _store_new(self, table, capacity: int, key: str, value: object, hash_val: int) -> bool:
+        """
+        Stores a key that is known not to be in the table yet, in the first free slot it probes.
+        Returns False (storing nothing) if the probe sequence reaches no free slot within capacity probes
+        """
+        if self._probing.robin_hood:
+            self._robin_hood_store(table, capacity, key, value, hash_val)
+            return True
+
+        for index in self._probing.sequence(hash_val, capacity):
+            if table.state(index) != LIVE:
+                break
+        else:
+            return False
+
+        if table.state(index) == TOMBSTONE and table is self._buckets:
+            self._tombstones -= 1
+        table.store(index, key, value, hash_val)
+        return True
+
+    def _robin_hood_store(self, table, capacity: int, key: str, value: object, hash_val: int) -> None:
+        """
+        Returns nothing. Stores a key that is known not to be in the table yet, Robin Hood style: walking from
+        its home slot, the key takes the place of the first entry that is closer to its own home than the key is,
+        and that entry carries on looking for a slot the same way
+        """
+        index = hash_val % capacity
+        distance = 0
+
+        while table.state(index) == LIVE:
+            existing_distance = (index - table.hash_at(index)) % capacity
+            if existing_distance < distance:
+                # swaps the carried entry with the one in the slot
+                moved = (table.key_at(index), table.value_at(index), table.hash_at(index))
+                table.store(index, key, value, hash_val)
+                key, value, hash_val = moved
+                distance = existing_distance
+
+            index = (index + 1) % capacity
+            distance += 1
+
+        table.store(index, key, value, hash_val)
+
+    def _robin_hood_delete(self, table, capacity: int, index: int) -> None:
+        """
+        Returns nothing. Empties the slot at index and shifts the entries after it back by one slot,
+        until an empty slot or an entry already in its home slot is reached
+        """
+        next_index = (index + 1) % capacity
+        while table.state(next_index) == LIVE and (next_index - table.hash_at(next_index)) % capacity > 0:
+            table.move(next_index, index)
+            index = next_index
+            next_index = (index + 1) % capacity
+
+        table.set_empty(index)
+
+    def _find_slot(self, table, capacity: int, key: str, hash_val: int, record: bool = False) -> (int, int):
+        """
+        Probes the given table once for a key (and its hash). Returns a tuple with the index of the live slot
+        holding the key (or -1 if it is not there), and the index of the first free slot (tombstone or empty)
+        in the probe sequence, where the key would be inserted (or -1 if there is none)
+        If record is True, the number of probes is counted in the stats
+        """
+        found, free, probes = table.find_slot(key, hash_val, capacity, self._probing)
+        if record:
+            self._stats.record_probes(found >= 0, probes)
+        return found, free
+
+    def _probe_length(self, table, capacity: int, index: int) -> int:
+        """
+        Returns the number of probes a lookup takes to reach the live slot at index
+        """
+        length = 1
+        for probed in self._probing.sequence(table.hash_at(index), capacity):
+            if probed == index:
+                break
+            length += 1
+        return length
+
+    def probe_histogram(self) -> DynamicArray:
+        """
+        Returns a DynamicArray where the value at index i is the number of keys that a lookup finds with i + 1 probes
+        """
+        self._finish_resize()
+        histogram = DynamicArray()
+
+        for index in range(self._buckets.length()):
+            if self._buckets.state(index) == LIVE:
+                length = self._probe_length(self._buckets, self._capacity, index)
+                while histogram.length() < length:
+                    histogram.append(0)
+                histogram[length - 1] += 1
+
+        return histogram
+
+    def average_probe_length(self) -> float:
+        """
+        Returns the average number of probes a lookup takes to find a key that is in the hash map
+        """
+        histogram = self.probe_histogram()
+        if self._size == 0:
+            return 0.0
+
+        total = 0
+        for index in range(histogram.length()):
+            total += (index + 1) * histogram[index]
+        return total / self._size
 
     def resize_table(self, new_capacity: int) -> None:
         """
@@ -120,110 +832,345 @@ class HashMap:
         """
         if new_capacity < 1 or new_capacity < self._size:
             return
+        new_capacity = self._fit_capacity(new_capacity)
 
-        # saves the old dynamic array
-        old_array = self._buckets
+        # an explicit resize is done all at once, so any incremental resize is finished first
+        self._finish_resize()
+        start = perf_counter()
 
-        # reassigns the capacity and creates a new Dynamic Array
+        self._rebuild((self._buckets,), new_capacity)
+
+        if self._stats is not None:
+            self._stats.resizes += 1
+            self._stats.resize_time += perf_counter() - start
+
+    def _fit_capacity(self, new_capacity: int) -> int:
+        """
+        Returns the capacity a resize to new_capacity ends up with: new_capacity rounded by the capacity policy,
+        grown until the current keys fill less than half of it
+        """
+        new_capacity = round_capacity(new_capacity, self._capacity_policy)
+
+        # put would have doubled the table whenever it reached half full while the entries went back in,
+        # so the capacity they would have ended up with is picked up front
+        while (self._size - 1) / new_capacity >= 0.5:
+            new_capacity = grow_capacity(new_capacity, self._capacity_policy)
+        return new_capacity
+
+    def _rebuild(self, old_tables: tuple, new_capacity: int) -> None:
+        """
+        Returns nothing. Replaces the table with a new one of new_capacity holding the live entries of old_tables.
+        If the probing can't place every entry at that capacity (which only happens on capacities it doesn't
+        fully cover), the capacity is doubled and the entries are moved again
+        """
         self._capacity = new_capacity
         self.clear()
 
-        # for each element in the old array, adds the element to the new array (calling put)
-        for index in range(old_array.length()):
-            elem = old_array[index]
-            if elem is not None and not elem.is_tombstone:
-                self.put(elem.key, elem.value)
+        # the keys are known to be unique and their hashes are cached, so the live entries are moved straight
+        # into the new table, without put's load check, key comparisons or (for HashEntry tables) new entries
+        while not all(self._rehash(old_table) for old_table in old_tables):
+            self._capacity = grow_capacity(self._capacity, self._capacity_policy)
+            self.clear()
 
-    def get(self, key: str) -> object:
+    def _rehash(self, old_table) -> bool:
         """
-        Given a key, returns the value of that key if it is in the hash map. Otherwise, returns None
+        Moves every live entry of old_table into the current table. Returns False if some entry's probe sequence
+        reached no free slot, in which case the current table is left partly filled
         """
-        # calculates which index the key belongs at based on hash function
-        hash_val = self._hash_function(key)
-        index = hash_val % self._capacity
+        table, capacity = self._buckets, self._capacity
+
+        # Robin Hood entries have to be placed in order of their distance from home
+        if self._probing.robin_hood:
+            for index in range(old_table.length()):
+                if old_table.state(index) == LIVE:
+                    self._robin_hood_store(table, capacity, old_table.key_at(index), old_table.value_at(index),
+                                           old_table.hash_at(index))
+                    self._size += 1
+            return True
+
+        if type(old_table) is type(table):
+            count = table.insert_all(old_table, self._probing, capacity)
+            if count < 0:
+                return False
+            self._size += count
+            return True
+
+        for index in range(old_table.length()):
+            if old_table.state(index) == LIVE:
+                if not self._store_new(table, capacity, old_table.key_at(index), old_table.value_at(index),
+                                       old_table.hash_at(index)):
+                    return False
+                self._size += 1
+        return True
 
-        # establishes variables for probing
-        entry = self._buckets[index]
-        to_square = 0
+    def _lookup(self, key: str, hash_val: int) -> object:
+        """
+        Returns the value of a key whose hash has already been calculated, or _NOT_FOUND if it is not in the hash map
+        """
+        record = self._stats is not None
+
+        # if a resize is in progress, moves a few more old slots over, and checks the old array too
+        if self._old_buckets is not None:
+            self._migrate_buckets(self._migrate_step)
+            if self._old_buckets is not None:
+                old_index, _ = self._find_slot(self._old_buckets, self._old_capacity, key, hash_val)
+                if old_index >= 0:
+                    if record:
+                        self._stats.record_probes(True, self._probe_length(self._old_buckets, self._old_capacity,
+                                                                           old_index))
+                    return self._old_buckets.value_at(old_index)
 
         # searches the indices to see if the key is in the hash map
-        while entry is not None:
-            # if found, returns that entry's value
-            if entry.key == key and not entry.is_tombstone:
-                return entry.value
+        table = self._buckets
+        index, _, probes = table.find_slot(key, hash_val, self._capacity, self._probing)
+        if record:
+            self._stats.record_probes(index >= 0, probes)
+        if index < 0:
+            return _NOT_FOUND
+        return table.value_at(index)
 
-            # if the entry is found, but it is a tombstone, returns None
-            if entry.key == key and entry.is_tombstone:
-                return None
+    def get(self, key: str) -> object:
+        """
+        Given a key, returns the value of that key if it is in the hash map. Otherwise, returns None
+        """
+        if self._stats is not None:
+            self._stats.gets += 1
 
-            # if not yet found, probes to the next index
-            to_square += 1
-            new_index = (index + to_square ** 2) % self._capacity
-            entry = self._buckets[new_index]
+        # calculates which index the key belongs at based on hash function
+        value = self._lookup(key, self._hash_function(key) & HASH_MASK)
 
         # if the key does not exist in the hash map, returns None
-        return None
+        if value is _NOT_FOUND:
+            return None
+        return value
 
     def contains_key(self, key: str) -> bool:
         """
-        Given a key, returns True if the key is in the hash map. Otherwise, returns False
+        Given a key, returns True if the key is in the hash map (even if its value is None). Otherwise, returns False
         """
-        # retrieves the value of the key to determine if the key exists
-        elem = self.get(key)
-
-        if elem is None:
-            return False
-        return True
+        if self._stats is not None:
+            self._stats.gets += 1
+        return self._lookup(key, self._hash(key)) is not _NOT_FOUND
 
     def remove(self, key: str) -> None:
         """
         Returns nothing. Given a key, removes the element from the dynamic array and replaces it with a tombstone
         """
+        if self._stats is not None:
+            self._stats.removes += 1
         if self._size == 0:
             return
 
-        # if the key is in the array, probes for it, then removes its key and value, replacing it with a tombstone
-        if self.contains_key(key):
-            hash_val = self._hash_function(key)
-            index = hash_val % self._capacity
+        self._remove(key, self._hash(key))
 
-            # establishes variables for probing
-            entry = self._buckets[index]
-            to_square = 0
-            new_index = index
+    def _remove(self, key: str, hash_val: int) -> None:
+        """
+        Returns nothing. Does the work of remove for a key whose hash has already been calculated
+        """
+        # if a resize is in progress, moves a few more old slots over first
+        if self._old_buckets is not None:
+            self._migrate_buckets(self._migrate_step)
+
+        # probes once for the key (and in the old array too, while a resize is in progress)
+        table = self._buckets
+        index, _ = self._find_slot(table, self._capacity, key, hash_val)
+        if index < 0 and self._old_buckets is not None:
+            table = self._old_buckets
+            index, _ = self._find_slot(table, self._old_capacity, key, hash_val)
+
+        if index < 0:
+            return
+        self._size -= 1
+        self._mod_count += 1
 
-            # searches the indices until it reaches the desired key
-            while entry.key != key:
-                # if not yet found, probes to the next index
-                to_square += 1
-                new_index = (index + to_square ** 2) % self._capacity
-                entry = self._buckets[new_index]
+        # a Robin Hood array is closed up by shifting entries back, so it never holds tombstones
+        if self._probing.robin_hood and table is self._buckets:
+            self._robin_hood_delete(table, self._capacity, index)
+            return
 
-            # once found, makes the entry a tombstone
-            self._buckets[new_index].is_tombstone = True
-            self._size -= 1
+        # if the key is in the array, removes its key and value, replacing it with a tombstone
+        # (only tombstones in the current array are counted, the old array is let go once migrated)
+        table.make_tombstone(index)
+        if table is self._buckets:
+            self._tombstones += 1
+
+    def put_many(self, pairs) -> None:
+        """
+        Returns nothing. Adds (or updates) every (key, value) pair of an iterable or DynamicArray of pairs.
+        The table is grown once up front for all the pairs, and the keys are hashed in one batch
+        """
+        pairs = to_list(pairs)
+        if self._stats is not None:
+            self._stats.puts += len(pairs)
+
+        self._reserve(len(pairs))
+
+        hashes = hash_many(self._hash_function, [pair[0] for pair in pairs])
+        for index in range(len(pairs)):
+            self._put(pairs[index][0], pairs[index][1], hashes[index] & HASH_MASK)
+
+    def _reserve_capacity(self, count: int) -> int:
+        """
+        Returns the capacity the map would double up to if count more keys were added
+        """
+        return self._capacity_for(self._size + count)
+
+    def _capacity_for(self, count: int) -> int:
+        """
+        Returns the capacity the map would double up to (from its current capacity) to hold count keys
+        while staying under half full
+        """
+        new_capacity = self._capacity
+        while count / new_capacity >= 0.5:
+            new_capacity = grow_capacity(new_capacity, self._capacity_policy)
+        return new_capacity
+
+    def _reserve(self, count: int) -> None:
+        """
+        Returns nothing. Makes room for count more keys at once, instead of doubling along the way
+        """
+        new_capacity = self._reserve_capacity(count)
+        if new_capacity != self._capacity:
+            self.resize_table(new_capacity)
+
+    def reserve(self, count: int) -> None:
+        """
+        Returns nothing. Grows the table at once so that it holds count keys in all without resizing again.
+        A table is never shrunk by reserve
+        """
+        new_capacity = self._capacity_for(count)
+        if new_capacity != self._capacity:
+            self.resize_table(new_capacity)
+
+    def _entries(self):
+        """
+        Yields a (key, value, cached hash) tuple for every key in the hash map, skipping empty slots and tombstones.
+        Raises a RuntimeError if a key is added or removed (or the table resized) while it is iterating
+        """
+        self._finish_resize()
+        mod_count = self._mod_count
+        table = self._buckets
+
+        for index in range(table.length()):
+            if table.state(index) == LIVE:
+                yield table.key_at(index), table.value_at(index), table.hash_at(index)
+                if self._mod_count != mod_count:
+                    raise RuntimeError("HashMap changed during iteration")
+
+    def keys(self):
+        """
+        Returns a generator over the keys of the hash map, which walks the array as it goes instead of copying it
+        """
+        return (entry[0] for entry in self._entries())
+
+    def values(self):
+        """
+        Returns a generator over the values of the hash map
+        """
+        return (entry[1] for entry in self._entries())
+
+    def items(self):
+        """
+        Returns a generator over the (key, value) pairs of the hash map
+        """
+        return ((entry[0], entry[1]) for entry in self._entries())
+
+    def __iter__(self):
+        """
+        Iterates over the keys of the hash map
+        """
+        return self.keys()
+
+    def update(self, other, conflict='right') -> None:
+        """
+        Returns nothing. Adds every key of another HashMap (open addressing or chaining) to this one.
+        For a key in both maps, conflict decides the value: 'right' takes the other map's value, 'left' keeps
+        this map's value, and a function is called with (this map's value, the other map's value).
+        The table is grown once up front, and if the other map is an open addressing HashMap with the same
+        hash function, its cached hashes are reused instead of hashing the keys again
+        """
+        resolve = make_resolver(conflict)
+        if self._stats is not None:
+            self._stats.puts += other.get_size()
+        self._reserve(other.get_size())
+
+        if type(other) is HashMap and other._hash_function is self._hash_function:
+            for key, value, hash_val in other._entries():
+                self._put(key, value, hash_val, resolve)
+            return
+
+        # otherwise the keys are hashed again with this map's hash function, in one batch
+        entries = list(other._entries())
+        hashes = hash_many(self._hash_function, [entry[0] for entry in entries])
+        for index in range(len(entries)):
+            self._put(entries[index][0], entries[index][1], hashes[index] & HASH_MASK, resolve)
+
+    def merge(self, other, conflict='right') -> "HashMap":
+        """
+        Returns a new HashMap (with the same settings as this one) holding the keys of both maps,
+        leaving both unchanged. conflict works as in update
+        """
+        merged = HashMap(self._capacity, self._hash_function, self._migrate_step,
+                         self._table_class is CompactTable, self._probing, self._stats is not None,
+                         self._capacity_policy)
+        merged.update(self)
+        merged.update(other, conflict)
+        return merged
+
+    def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a DynamicArray with the value of each key of an iterable or DynamicArray of keys, in order
+        (None for keys that are not in the hash map). The keys are hashed in one batch
+        """
+        keys = to_list(keys)
+        hashes = hash_many(self._hash_function, keys)
+        if self._stats is not None:
+            self._stats.gets += len(keys)
+
+        values = DynamicArray()
+        for index in range(len(keys)):
+            value = self._lookup(keys[index], hashes[index] & HASH_MASK)
+            values.append(None if value is _NOT_FOUND else value)
+        return values
+
+    def remove_many(self, keys) -> None:
+        """
+        Returns nothing. Removes every key of an iterable or DynamicArray of keys. The keys are hashed in one batch
+        """
+        keys = to_list(keys)
+        hashes = hash_many(self._hash_function, keys)
+        if self._stats is not None:
+            self._stats.removes += len(keys)
+
+        for index in range(len(keys)):
+            if self._size == 0:
+                return
+            self._remove(keys[index], hashes[index] & HASH_MASK)
 
     def clear(self) -> None:
         """"
         Returns nothing. Clears the hash table by creating a new array with new chains
         """
-        self._buckets = DynamicArray()
-        for _ in range(self._capacity):
-            self._buckets.append(None)
+        self._old_buckets = None
+        self._old_capacity = 0
+        self._migrate_index = 0
 
+        self._buckets = self._table_class(self._capacity)
         self._size = 0
+        self._tombstones = 0
+        self._mod_count += 1
 
     def get_keys(self) -> DynamicArray:
         """
         Returns a DynamicArray created of all the keys in the hash map
         """
+        self._finish_resize()
         array = DynamicArray()
 
-        # goes through each entry and adds its key to the array
+        # goes through each slot and adds its key to the array if it is live
         for index in range(self._buckets.length()):
-            entry = self._buckets[index]
-            if entry is not None and not entry.is_tombstone:
-                array.append(entry.key)
+            if self._buckets.state(index) == LIVE:
+                array.append(self._buckets.key_at(index))
 
         return array
 
@@ -416,3 +1363,38 @@ if __name__ == "__main__":
     m.remove('100')
     m.resize_table(2)
     print(m.get_keys())
+
+    print("\ncompact table")
+    print("-------------")
+    m = HashMap(10, hash_function_2, compact=True)
+    for i in range(100, 200, 10):
+        m.put(str(i), str(i * 10))
+    m.remove('150')
+    print(m.get_size(), m.get_capacity(), m.get('160'), m.get('150'), m.contains_key('190'))
+    print(m.get_keys())
+
+    print("\nprobing strategies")
+    print("------------------")
+    for probing in (LinearProbing(), QuadraticProbing(), DoubleHashing(), RobinHoodProbing()):
+        m = HashMap(50, hash_function_1, probing=probing)
+        for i in range(30):
+            m.put('key' + str(i), i)
+        for i in range(0, 30, 3):
+            m.remove('key' + str(i))
+        print(type(probing).__name__, m.get_size(), m.get('key29'), m.get('key3'),
+              round(m.average_probe_length(), 2))
+
+    print("\nstats and probe histogram")
+    print("-------------------------")
+    m = HashMap(20, hash_function_1, stats=True)
+    for key in ('key12', 'key21', 'kye12', 'yek21', 'key3', 'key30', 'key03'):
+        m.put(key, key.upper())
+    for key in ('key21', 'key30'):
+        m.remove(key)
+    m.get('yek21')
+    m.get('missing')
+    stats = m.get_stats()
+    print(stats.puts, stats.gets, stats.hits, stats.misses, stats.tombstones)
+    print(m.probe_histogram())
+    m.purge_tombstones()
+    print(m.get_stats().tombstones, m.probe_histogram())
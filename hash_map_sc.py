@@ -8,25 +8,89 @@
 #              Also includes an algorithm to find the mode of a dynamic array.
 
 
-from a6_include import (DynamicArray, LinkedList,
-                        hash_function_1, hash_function_2)
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from operator import add
+from time import perf_counter
+
+from a6_include import (DynamicArray, LinkedList, SLNode, SortedBucket, HashMapStats, CAPACITY_POLICIES, grow_capacity,
+                        hash_many, make_resolver, round_capacity, shrink_capacity, to_list,
+                        hash_function_1, hash_function_2, hash_function_builtin)
 
 
 class HashMap:
-    def __init__(self, capacity: int, function) -> None:
+    def __init__(self, capacity: int, function, max_load: float = None, min_load: float = None,
+                 migrate_step: int = None, stats: bool = False, capacity_policy: str = None,
+                 expected: int = None, treeify_threshold: int = None) -> None:
         """
         Initialize new HashMap that uses
         separate chaining for collision resolution
-        DO NOT CHANGE THIS METHOD IN ANY WAY
+
+        max_load and min_load are optional load factor thresholds. When max_load is given, put doubles the
+        capacity once the load rises above it; when min_load is given, remove halves the capacity once the
+        load falls below it (never going below the initial capacity)
+
+        When migrate_step is given, those automatic resizes are done incrementally: the old and new bucket
+        arrays coexist, and each following put/get/remove moves migrate_step old buckets into the new array
+
+        When stats is True, the map keeps a HashMapStats of its operations and resizes (see get_stats)
+
+        capacity_policy rounds every capacity the map takes: None keeps capacities as asked for, 'pow2' rounds
+        them up to a power of two (so a bucket is picked with a bit mask instead of a division), and 'prime'
+        rounds them up to a prime of a precomputed table. When expected is given, the table starts out big
+        enough for that many keys (see reserve)
+
+        When treeify_threshold is given, a chain that grows longer than that is switched to a SortedBucket,
+        where a key is found by binary search, so that many colliding keys (by chance or crafted on purpose)
+        cost O(log n) per lookup instead of O(n). It is switched back to a LinkedList once it shrinks to half
+        the threshold. The keys must then be comparable, as strings are
         """
+        if max_load is not None and max_load <= 0:
+            raise ValueError("max_load must be greater than 0")
+        if min_load is not None and max_load is not None and min_load >= max_load / 2:
+            raise ValueError("min_load must be less than half of max_load")
+        if migrate_step is not None and migrate_step < 1:
+            raise ValueError("migrate_step must be at least 1")
+        if capacity_policy not in CAPACITY_POLICIES:
+            raise ValueError("capacity_policy must be None, 'pow2' or 'prime'")
+        if treeify_threshold is not None and treeify_threshold < 2:
+            raise ValueError("treeify_threshold must be at least 2")
+
+        self._capacity_policy = capacity_policy
+        capacity = round_capacity(capacity, capacity_policy)
+
         self._buckets = DynamicArray()
         for _ in range(capacity):
             self._buckets.append(LinkedList())
 
-        self._capacity = capacity
+        self._set_capacity(capacity)
         self._hash_function = function
         self._size = 0
 
+        # counts the changes that add, remove or move keys, so that an iteration can tell the map changed under it
+        self._mod_count = 0
+
+        self._max_load = max_load
+        self._min_load = min_load
+        self._min_capacity = capacity
+
+        # state of an in-progress incremental resize
+        self._migrate_step = migrate_step
+        self._old_buckets = None
+        self._old_capacity = 0
+        self._migrate_index = 0
+        self._fill_index = 0
+
+        # counters are only kept when asked for, so that a map without them pays a single check per operation
+        self._stats = HashMapStats() if stats else None
+
+        # chains longer than the threshold are kept as SortedBuckets (see _treeify)
+        self._treeify_threshold = treeify_threshold
+
+        if expected is not None:
+            self.reserve(expected)
+
     def __str__(self) -> str:
         """
         Override string method to provide more readable output
@@ -53,31 +117,222 @@ class HashMap:
 
     # ------------------------------------------------------------------ #
 
-    def find_bucket(self, key):
+    def _set_capacity(self, capacity: int) -> None:
+        """
+        Returns nothing. Sets the capacity, along with the bit mask that picks a bucket when it is a power of two
+        """
+        self._capacity = capacity
+        self._mask = capacity - 1 if self._capacity_policy == 'pow2' else None
+
+    def find_bucket(self, key, hash_val: int = None):
         """
         Returns the bucket that a key should be found in, based on the hash function
+        (or on the key's hash, if it was already calculated)
         """
-        hash_val = self._hash_function(key)
-        index = hash_val % self._capacity
+        # if a resize is in progress, moves a few more old buckets over first
+        if self._old_buckets is not None:
+            self._migrate_buckets(self._migrate_step)
+
+        if hash_val is None:
+            hash_val = self._hash_function(key)
+
+        # keys whose old bucket has not been migrated yet still live (and are inserted) in the old bucket
+        if self._old_buckets is not None:
+            old_index = hash_val % self._old_capacity
+            if old_index >= self._migrate_index:
+                return self._old_buckets[old_index]
+
+        # with power of two capacities, the remainder is just the low bits of the hash
+        if self._mask is not None:
+            index = hash_val & self._mask
+        else:
+            index = hash_val % self._capacity
         bucket = self._buckets[index]
+
+        # while a resize is filling in the new bucket array, a bucket that isn't there yet is created here
+        if bucket is None:
+            bucket = LinkedList()
+            self._buckets[index] = bucket
         return bucket
 
+    def _bucket_location(self, hash_val: int) -> (DynamicArray, int):
+        """
+        Returns the bucket array (the old one, while a resize is moving buckets) and the index in it of the
+        bucket a hash belongs in, like find_bucket but without moving any old buckets
+        """
+        if self._old_buckets is not None:
+            old_index = hash_val % self._old_capacity
+            if old_index >= self._migrate_index:
+                return self._old_buckets, old_index
+
+        if self._mask is not None:
+            return self._buckets, hash_val & self._mask
+        return self._buckets, hash_val % self._capacity
+
+    def _treeify(self, buckets: DynamicArray, index: int) -> None:
+        """
+        Returns nothing. Switches the bucket at index from a LinkedList to a SortedBucket, or the other way
+        around, if its length has crossed the treeify threshold (or half of it)
+        """
+        bucket = buckets[index]
+        if isinstance(bucket, SortedBucket):
+            if bucket.length() <= self._treeify_threshold // 2:
+                buckets[index] = bucket.to_linked_list()
+        elif bucket.length() > self._treeify_threshold:
+            # keys that can't be compared with each other stay in a chain
+            try:
+                buckets[index] = SortedBucket(bucket)
+            except TypeError:
+                pass
+
+    def _start_resize(self, new_capacity: int, buckets: DynamicArray = None) -> None:
+        """
+        Returns nothing. Resizes the table to the new capacity, either all at once or, if migrate_step was given,
+        by setting up a new bucket array that the old buckets are moved into a few at a time.
+        buckets can be a prebuilt array of new_capacity empty buckets to use as the new bucket array.
+        Otherwise the new buckets are created up to migrate_step at a time by each migration step (or when a key
+        first lands in one), so that neither starting the resize nor any step allocates every bucket at once
+        """
+        new_capacity = round_capacity(new_capacity, self._capacity_policy)
+        if buckets is not None and buckets.length() != new_capacity:
+            raise ValueError("buckets must hold one bucket for each of the " + str(new_capacity) + " new buckets")
+        if self._migrate_step is None:
+            self.resize_table(new_capacity)
+            return
+
+        # a resize that is still running is finished before the next one starts
+        self._finish_resize()
+        if self._stats is not None:
+            self._stats.resizes += 1
+
+        self._old_buckets = self._buckets
+        self._old_capacity = self._capacity
+        self._migrate_index = 0
+        self._mod_count += 1
+
+        # prebuilt buckets are all there already, so there are none left to create
+        self._set_capacity(new_capacity)
+        if buckets is None:
+            buckets = DynamicArray([None] * new_capacity)
+            self._fill_index = 0
+        else:
+            self._fill_index = new_capacity
+        self._buckets = buckets
+
+    def _migrate_buckets(self, count: int) -> None:
+        """
+        Returns nothing. Moves up to count buckets from the old bucket array into the new one, and creates up to
+        count of the new buckets that don't exist yet. The resize is done once both have been worked through
+        """
+        start = perf_counter() if self._stats is not None else 0.0
+        stop = min(self._migrate_index + count, self._old_capacity)
+        buckets, mask = self._buckets, self._mask
+
+        for bucket_index in range(self._migrate_index, stop):
+            for node in self._old_buckets[bucket_index]:
+                # the node itself is moved, and its cached hash is used, so the key is not hashed again
+                index = node.hash & mask if mask is not None else node.hash % self._capacity
+                bucket = buckets[index]
+                if bucket is None:
+                    bucket = LinkedList()
+                    buckets[index] = bucket
+                bucket.insert_node(node)
+                if self._treeify_threshold is not None:
+                    self._treeify(buckets, index)
+            self._old_buckets[bucket_index] = None
+
+        self._migrate_index = stop
+
+        # creates new buckets as well, at most count per step however much bigger the new array is
+        fill_stop = min(self._fill_index + count, self._capacity)
+        for index in range(self._fill_index, fill_stop):
+            if buckets[index] is None:
+                buckets[index] = LinkedList()
+        self._fill_index = fill_stop
+
+        # once every old bucket is moved and every new bucket exists, the old array is let go
+        if self._migrate_index == self._old_capacity and self._fill_index == self._capacity:
+            self._old_buckets = None
+            self._old_capacity = 0
+            self._migrate_index = 0
+
+        if self._stats is not None:
+            self._stats.resize_time += perf_counter() - start
+
+    def _finish_resize(self) -> None:
+        """
+        Returns nothing. Moves all the remaining old buckets, if a resize is in progress
+        """
+        if self._old_buckets is not None:
+            self._migrate_buckets(max(self._old_capacity, self._capacity))
+
     def put(self, key: str, value: object) -> None:
         """
         Returns nothing. Adds a key with a value to the hash map, or updates the key if it already exists
         """
-        # calculates which bucket the key belongs in based on hash function
-        bucket = self.find_bucket(key)
+        if self._stats is not None:
+            self._stats.puts += 1
+        self._put(key, value, self._hash_function(key))
+
+    def _put(self, key: str, value: object, hash_val: int, resolve=None) -> None:
+        """
+        Returns nothing. Does the work of put for a key whose hash has already been calculated.
+        If resolve is given and the key exists, its value becomes resolve(old value, value)
+        """
+        # calculates which bucket the key belongs in based on its hash
+        bucket = self.find_bucket(key, hash_val)
 
         # determines if the key already exists
-        elem = bucket.contains(key)
+        elem = bucket.contains(key, hash_val)
         if elem is not None:
-            elem.value = value
+            elem.value = value if resolve is None else resolve(elem.value, value)
             return
 
-        # if the key doesn't exist, adds it to the front of the bucket linked list
-        bucket.insert(key, value)
+        # if the key doesn't exist, adds it (along with its hash) to the front of the bucket linked list
+        self._insert_node(SLNode(key, value, None, hash_val), bucket)
+
+    def _insert_node(self, node: SLNode, bucket: LinkedList = None) -> None:
+        """
+        Returns nothing. Adds a node (with its key's hash cached) for a key that is not in the hash map yet,
+        to the front of the given bucket, or of the bucket it belongs in
+        """
+        if bucket is None:
+            bucket = self.find_bucket(node.key, node.hash)
+        bucket.insert_node(node)
         self._size += 1
+        self._mod_count += 1
+
+        # a chain that has grown past the threshold is switched to a sorted bucket
+        if self._treeify_threshold is not None and bucket.length() > self._treeify_threshold:
+            self._treeify(*self._bucket_location(node.hash))
+
+        # if the load factor has grown past the threshold, doubles the table (thus reducing the load factor)
+        if self._max_load is not None and self._size > self._max_load * self._capacity:
+            self._start_resize(grow_capacity(self._capacity, self._capacity_policy))
+
+    def increment(self, key: str, amount: int = 1) -> int:
+        """
+        Adds amount to the (numeric) value of a key, or adds the key with a value of amount if it doesn't exist.
+        Returns the new value. The key is hashed once and its bucket walked once, unlike a get followed by a put
+        """
+        if self._stats is not None:
+            self._stats.puts += 1
+        return self._increment(key, amount, self._hash_function(key))
+
+    def _increment(self, key: str, amount: int, hash_val: int) -> int:
+        """
+        Does the work of increment for a key whose hash has already been calculated
+        """
+        bucket = self.find_bucket(key, hash_val)
+
+        # if the key already exists, its count is updated in place
+        elem = bucket.contains(key, hash_val)
+        if elem is not None:
+            elem.value += amount
+            return elem.value
+
+        self._insert_node(SLNode(key, amount, None, hash_val), bucket)
+        return amount
 
     def empty_buckets(self) -> int:
         """
@@ -87,6 +342,7 @@ class HashMap:
         if self._size == 0:
             return self._capacity
 
+        self._finish_resize()
         counter = 0
 
         # finds the length of each bucket and determines if it is empty
@@ -107,11 +363,17 @@ class HashMap:
         """
         Returns nothing. Clears the hash table by creating a new array with new chains
         """
+        self._old_buckets = None
+        self._old_capacity = 0
+        self._migrate_index = 0
+        self._fill_index = 0
+
         self._buckets = DynamicArray()
         for _ in range(self._capacity):
             self._buckets.append(LinkedList())
 
         self._size = 0
+        self._mod_count += 1
 
     def resize_table(self, new_capacity: int) -> None:
         """
@@ -119,29 +381,55 @@ class HashMap:
         """
         if new_capacity < 1:
             return
+        new_capacity = round_capacity(new_capacity, self._capacity_policy)
+
+        # an explicit resize is done all at once, so any incremental resize is finished first
+        self._finish_resize()
+        start = perf_counter()
 
         # saves the old dynamic array
         old_buckets = self._buckets
 
         # reassigns the capacity and creates a new Dynamic Array
-        self._capacity = new_capacity
+        self._set_capacity(new_capacity)
         self.clear()
+        mask = self._mask
 
-        # for each bucket in the old array, adds each element in the bucket to the new array (calling put)
+        # for each bucket in the old array, adds each element in the bucket to the new array
+        # the keys are already known to be unique, so the nodes themselves are moved (by their cached hash)
+        # without put
         for bucket_index in range(old_buckets.length()):
             bucket = old_buckets[bucket_index]
             for elem in bucket:
-                self.put(elem.key, elem.value)
+                index = elem.hash & mask if mask is not None else elem.hash % new_capacity
+                self._buckets[index].insert_node(elem)
+                if self._treeify_threshold is not None:
+                    self._treeify(self._buckets, index)
+                self._size += 1
+
+        if self._stats is not None:
+            self._stats.resizes += 1
+            self._stats.resize_time += perf_counter() - start
 
     def get(self, key: str) -> object:
         """
         Given a key, returns the value of that key if it is in the hash map. Otherwise, returns None
         """
-        # calculates which bucket the key belongs in based on hash function
-        bucket = self.find_bucket(key)
+        if self._stats is not None:
+            self._stats.gets += 1
+        return self._get(key, self._hash_function(key))
+
+    def _get(self, key: str, hash_val: int) -> object:
+        """
+        Returns the value of a key whose hash has already been calculated, or None if the key is not in the hash map
+        """
+        # calculates which bucket the key belongs in based on its hash
+        bucket = self.find_bucket(key, hash_val)
 
         # determines if the key is not in the hash map
-        elem = bucket.contains(key)
+        elem = bucket.contains(key, hash_val)
+        if self._stats is not None:
+            self._stats.record_lookup(elem is not None)
         if elem is None:
             return None
 
@@ -150,31 +438,232 @@ class HashMap:
 
     def contains_key(self, key: str) -> bool:
         """
-        Given a key, returns True if the key is in the hash map. Otherwise, returns False
+        Given a key, returns True if the key is in the hash map (even if its value is None). Otherwise, returns False
         """
-        # retrieves the value of the key to determine if the key exists
-        elem = self.get(key)
-
-        if elem is None:
-            return False
-        return True
+        # looks for the key's node rather than its value, so that a stored None value still counts
+        hash_val = self._hash_function(key)
+        found = self.find_bucket(key, hash_val).contains(key, hash_val) is not None
+        if self._stats is not None:
+            self._stats.gets += 1
+            self._stats.record_lookup(found)
+        return found
 
     def remove(self, key: str) -> None:
         """
         Returns nothing. Given a key, removes the node from the appropriate bucket
         """
+        if self._stats is not None:
+            self._stats.removes += 1
         if self._size == 0:
             return
 
-        if self.contains_key(key):
-            bucket = self.find_bucket(key)
-            bucket.remove(key)
+        # hashes the key once, and removes it from its bucket if it is there
+        self._remove(key, self._hash_function(key))
+
+    def _remove(self, key: str, hash_val: int) -> None:
+        """
+        Returns nothing. Does the work of remove for a key whose hash has already been calculated
+        """
+        bucket = self.find_bucket(key, hash_val)
+        if bucket.remove(key, hash_val):
             self._size -= 1
+            self._mod_count += 1
+
+            # a sorted bucket that has shrunk back down is switched back to a chain
+            if self._treeify_threshold is not None and isinstance(bucket, SortedBucket):
+                self._treeify(*self._bucket_location(hash_val))
+
+            # if the load factor has fallen below the threshold, halves the table to give back the memory
+            if self._min_load is not None and self._capacity > self._min_capacity \
+                    and self._size < self._min_load * self._capacity:
+                self._start_resize(max(shrink_capacity(self._capacity, self._capacity_policy), self._min_capacity))
+
+    def put_many(self, pairs) -> None:
+        """
+        Returns nothing. Adds (or updates) every (key, value) pair of an iterable or DynamicArray of pairs.
+        The table is grown once up front for all the pairs, and the keys are hashed in one batch
+        """
+        pairs = to_list(pairs)
+        if self._stats is not None:
+            self._stats.puts += len(pairs)
+
+        self._reserve(len(pairs))
+
+        hashes = hash_many(self._hash_function, [pair[0] for pair in pairs])
+        for index in range(len(pairs)):
+            self._put(pairs[index][0], pairs[index][1], hashes[index])
+
+    def _reserve_capacity(self, count: int) -> int:
+        """
+        Returns the capacity the map would double up to if count more keys were added
+        (the current capacity if the map doesn't grow automatically)
+        """
+        if self._max_load is None:
+            return self._capacity
+        return self._capacity_for(self._size + count, self._max_load)
+
+    def _capacity_for(self, count: int, max_load: float) -> int:
+        """
+        Returns the capacity the map would double up to (from its current capacity) to hold count keys
+        without its load rising above max_load
+        """
+        new_capacity = self._capacity
+        while count > max_load * new_capacity:
+            new_capacity = grow_capacity(new_capacity, self._capacity_policy)
+        return new_capacity
+
+    def _reserve(self, count: int) -> None:
+        """
+        Returns nothing. If the map grows automatically, makes room for count more keys at once,
+        instead of doubling along the way
+        """
+        new_capacity = self._reserve_capacity(count)
+        if new_capacity != self._capacity:
+            self.resize_table(new_capacity)
+
+    def reserve(self, count: int) -> None:
+        """
+        Returns nothing. Grows the table at once so that it holds count keys in all without resizing again:
+        up to max_load, or one key per bucket if the map has no max_load. A table is never shrunk by reserve
+        """
+        max_load = self._max_load if self._max_load is not None else 1.0
+        new_capacity = self._capacity_for(count, max_load)
+        if new_capacity != self._capacity:
+            self.resize_table(new_capacity)
+
+    def _entries(self):
+        """
+        Yields a (key, value, cached hash) tuple for every key in the hash map, walking each chain in turn.
+        Raises a RuntimeError if a key is added or removed (or the table resized) while it is iterating
+        """
+        self._finish_resize()
+        mod_count = self._mod_count
+        buckets = self._buckets
+
+        for bucket_index in range(buckets.length()):
+            for node in buckets[bucket_index]:
+                yield node.key, node.value, node.hash
+                if self._mod_count != mod_count:
+                    raise RuntimeError("HashMap changed during iteration")
+
+    def keys(self):
+        """
+        Returns a generator over the keys of the hash map, which walks the chains as it goes instead of copying them
+        """
+        return (entry[0] for entry in self._entries())
+
+    def values(self):
+        """
+        Returns a generator over the values of the hash map
+        """
+        return (entry[1] for entry in self._entries())
+
+    def items(self):
+        """
+        Returns a generator over the (key, value) pairs of the hash map
+        """
+        return ((entry[0], entry[1]) for entry in self._entries())
+
+    def __iter__(self):
+        """
+        Iterates over the keys of the hash map
+        """
+        return self.keys()
+
+    def update(self, other, conflict='right') -> None:
+        """
+        Returns nothing. Adds every key of another HashMap (chaining or open addressing) to this one.
+        For a key in both maps, conflict decides the value: 'right' takes the other map's value, 'left' keeps
+        this map's value, and a function is called with (this map's value, the other map's value).
+        The table is grown once up front, and if the other map is a chaining HashMap with the same hash function,
+        its cached hashes are reused instead of hashing the keys again
+        """
+        resolve = make_resolver(conflict)
+        if self._stats is not None:
+            self._stats.puts += other.get_size()
+        self._reserve(other.get_size())
+
+        if type(other) is HashMap and other._hash_function is self._hash_function:
+            for key, value, hash_val in other._entries():
+                self._put(key, value, hash_val, resolve)
+            return
+
+        # otherwise the keys are hashed again with this map's hash function, in one batch
+        entries = list(other._entries())
+        hashes = hash_many(self._hash_function, [entry[0] for entry in entries])
+        for index in range(len(entries)):
+            self._put(entries[index][0], entries[index][1], hashes[index], resolve)
+
+    def merge(self, other, conflict='right') -> "HashMap":
+        """
+        Returns a new HashMap (with the same settings as this one) holding the keys of both maps,
+        leaving both unchanged. conflict works as in update
+        """
+        merged = HashMap(self._min_capacity, self._hash_function, self._max_load, self._min_load,
+                         self._migrate_step, self._stats is not None, self._capacity_policy,
+                         treeify_threshold=self._treeify_threshold)
+        merged.resize_table(self._capacity)
+        merged.update(self)
+        merged.update(other, conflict)
+        return merged
+
+    def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a DynamicArray with the value of each key of an iterable or DynamicArray of keys, in order
+        (None for keys that are not in the hash map). The keys are hashed in one batch
+        """
+        keys = to_list(keys)
+        hashes = hash_many(self._hash_function, keys)
+        if self._stats is not None:
+            self._stats.gets += len(keys)
+
+        values = DynamicArray()
+        for index in range(len(keys)):
+            values.append(self._get(keys[index], hashes[index]))
+        return values
+
+    def remove_many(self, keys) -> None:
+        """
+        Returns nothing. Removes every key of an iterable or DynamicArray of keys. The keys are hashed in one batch
+        """
+        keys = to_list(keys)
+        hashes = hash_many(self._hash_function, keys)
+        if self._stats is not None:
+            self._stats.removes += len(keys)
+
+        for index in range(len(keys)):
+            if self._size == 0:
+                return
+            self._remove(keys[index], hashes[index])
+
+    def chain_histogram(self) -> DynamicArray:
+        """
+        Returns a DynamicArray where the value at index i is the number of buckets holding a chain of length i
+        """
+        self._finish_resize()
+        histogram = DynamicArray()
+
+        for bucket_index in range(self._buckets.length()):
+            length = self._buckets[bucket_index].length()
+            while histogram.length() <= length:
+                histogram.append(0)
+            histogram[length] += 1
+
+        return histogram
+
+    def get_stats(self) -> HashMapStats:
+        """
+        Returns the map's HashMapStats (with the current chain lengths), or None if it was created without stats
+        """
+        if self._stats is not None:
+            self._stats.chain_lengths = self.chain_histogram()
+        return self._stats
 
     def get_keys(self) -> DynamicArray:
         """
         Returns a DynamicArray created of all the keys in the hash map
         """
+        self._finish_resize()
         array = DynamicArray()
 
         # goes through each node in each bucket and adds it to the array
@@ -189,54 +678,327 @@ class HashMap:
         """
         Returns the dynamic array that holds all the buckets
         """
+        self._finish_resize()
         return self._buckets
 
 
-def find_mode(da: DynamicArray) -> (DynamicArray, int):
+class CountEntry:
     """
-    Given an array, returns a tuple with the values that occur most in that array, and the quantity of times they occur
+    The count of one key in a FrequencyCounter, linked into the list of keys of its CountGroup
     """
-    map = HashMap(da.length() // 3, hash_function_1)
 
-    # creates a hash map which uses the array element as the key, and the number of times it has occurred as the value
-    for idx in range(da.length()):
-        key = da[idx]
-        count = map.get(key)
+    __slots__ = ('key', 'count', 'group', 'older', 'newer')
+
+    def __init__(self, key: str) -> None:
+        """Initialize an entry for a key that has not been counted yet."""
+        self.key = key
+        self.count = 0
+        self.group = None
+        self.older = None
+        self.newer = None
+
+
+class CountGroup:
+    """
+    All the keys of a FrequencyCounter that share the same count. The groups form a list ordered by count
+    """
+
+    __slots__ = ('count', 'first', 'last', 'prev', 'next')
+
+    def __init__(self, count: int) -> None:
+        """Initialize an empty group for the given count."""
+        self.count = count
+        self.first = None
+        self.last = None
+        self.prev = None
+        self.next = None
+
+
+class CountGroups:
+    """
+    The list of CountGroups of a FrequencyCounter (or of an LFU BoundedCache), ordered by count. Each group keeps
+    its entries (any objects with group, older and newer attributes) in a list from the oldest to the newest
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty list of groups."""
+        # the group with the lowest count, and the group with the highest count
+        self.lowest = None
+        self.highest = None
+
+    def insert_group(self, count: int, before: CountGroup) -> CountGroup:
+        """
+        Return a new, empty group for count, linked in right after the group before (or first, if before is None)
+        """
+        group = CountGroup(count)
+        group.prev = before
+        group.next = self.lowest if before is None else before.next
+
+        if before is None:
+            self.lowest = group
+        else:
+            before.next = group
+        if group.next is None:
+            self.highest = group
+        else:
+            group.next.prev = group
+
+        return group
+
+    def link(self, entry, group: CountGroup) -> None:
+        """Add an entry at the newest end of a group."""
+        entry.group = group
+        entry.older = group.last
+        entry.newer = None
+
+        if group.last is None:
+            group.first = entry
+        else:
+            group.last.newer = entry
+        group.last = entry
+
+    def unlink(self, entry) -> None:
+        """Take an entry out of its group, dropping the group if it is left empty."""
+        group = entry.group
+        if entry.older is None:
+            group.first = entry.newer
+        else:
+            entry.older.newer = entry.newer
+        if entry.newer is None:
+            group.last = entry.older
+        else:
+            entry.newer.older = entry.older
+
+        if group.first is None:
+            if group.prev is None:
+                self.lowest = group.next
+            else:
+                group.prev.next = group.next
+            if group.next is None:
+                self.highest = group.prev
+            else:
+                group.next.prev = group.prev
 
-        # if the element is already in the map, adds 1 to its count
-        if count is not None:
-            map.put(key, count + 1)
+        entry.group = None
+        entry.older = None
+        entry.newer = None
 
-        # if the element is not in the map, adds it to the map with a count of 1
+
+class FrequencyCounter:
+    """
+    Counts how often each key occurs in a stream of keys, without ever holding the whole stream.
+    The counts live in a chaining HashMap, and the keys are also kept in groups by count (in the style of an
+    LFU cache), so the running mode and the k most frequent keys are known at any point without another pass
+    """
+
+    def __init__(self, function=hash_function_1, capacity: int = 16) -> None:
+        """
+        Initialize a new, empty counter that hashes keys with the given function
+        """
+        self._hash_function = function
+        self._map = HashMap(max(capacity, 1), function, max_load=1.0)
+        self._total = 0
+
+        # the keys grouped by count, from the group counted least to the group counted most (the mode)
+        self._groups = CountGroups()
+
+    def add(self, key: str) -> int:
+        """
+        Counts one more occurrence of a key. Returns the key's new count
+        """
+        return self._add(key, self._hash_function(key))
+
+    def _add(self, key: str, hash_val: int) -> int:
+        """
+        Does the work of add for a key whose hash has already been calculated
+        """
+        # the key is hashed once, and its entry is found by the same hash
+        node = self._map.find_bucket(key, hash_val).contains(key, hash_val)
+        if node is not None:
+            entry = node.value
         else:
-            map.put(key, 1)
+            entry = CountEntry(key)
+            self._map._put(key, entry, hash_val)
+
+        # moves the entry from the group of its old count to the group of its new count (creating it if needed)
+        groups = self._groups
+        group = entry.group
+        target = groups.lowest if group is None else group.next
+        if target is None or target.count != entry.count + 1:
+            target = groups.insert_group(entry.count + 1, group)
+
+        if group is not None:
+            groups.unlink(entry)
+        entry.count += 1
+        groups.link(entry, target)
+
+        self._total += 1
+        return entry.count
+
+    def update(self, items, chunk_size: int = 1024) -> None:
+        """
+        Returns nothing. Counts every key of an iterable, generator or DynamicArray. The keys are read chunk_size
+        at a time, and each chunk is hashed in one batch, so only one chunk is ever held in memory
+        """
+        for chunk in _chunks(items, chunk_size):
+            hashes = hash_many(self._hash_function, chunk)
+            for index in range(len(chunk)):
+                self._add(chunk[index], hashes[index])
+
+    def count(self, key: str) -> int:
+        """
+        Returns the number of times a key has been counted (0 if it never has)
+        """
+        entry = self._map.get(key)
+        if entry is None:
+            return 0
+        return entry.count
+
+    def get_size(self) -> int:
+        """
+        Returns the number of distinct keys counted
+        """
+        return self._map.get_size()
+
+    def total(self) -> int:
+        """
+        Returns the number of keys counted, including repeats
+        """
+        return self._total
+
+    def mode(self) -> (DynamicArray, int):
+        """
+        Returns a tuple with the keys counted most often (in the order they reached that count),
+        and how many times they were counted
+        """
+        modes = DynamicArray()
+        highest = self._groups.highest
+        if highest is None:
+            return modes, 0
+
+        entry = highest.first
+        while entry is not None:
+            modes.append(entry.key)
+            entry = entry.newer
+        return modes, highest.count
+
+    def most_common(self, k: int) -> DynamicArray:
+        """
+        Returns a DynamicArray of (key, count) tuples of the k keys counted most often, most frequent first.
+        Ties are broken by the order the keys reached their count
+        """
+        result = DynamicArray()
+        group = self._groups.highest
+
+        # walks down the groups from the highest count, so only the k returned keys are visited
+        while group is not None and result.length() < k:
+            entry = group.first
+            while entry is not None and result.length() < k:
+                result.append((entry.key, group.count))
+                entry = entry.newer
+            group = group.prev
+
+        return result
+
+
+def _chunks(items, chunk_size: int):
+    """
+    Yields the elements of an iterable, generator or DynamicArray as lists of up to chunk_size elements
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    # a DynamicArray can't be iterated over, so its elements are read by index
+    if isinstance(items, DynamicArray):
+        array = items
+        iterator = (array[index] for index in range(array.length()))
+    else:
+        iterator = iter(items)
+
+    chunk = list(islice(iterator, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunk_size))
+
+
+def _count_chunk(function, chunk: list) -> HashMap:
+    """
+    Returns a HashMap with the count of each key of one chunk. Runs in a worker process
+    """
+    counts = HashMap(16, function, max_load=1.0)
+    hashes = hash_many(function, chunk)
+    for index in range(len(chunk)):
+        counts._increment(chunk[index], 1, hashes[index])
+    return counts
+
+
+def count_parallel(items, function=hash_function_1, workers: int = None, chunk_size: int = 100000) -> HashMap:
+    """
+    Returns a HashMap with the number of times each key of an iterable, generator or DynamicArray occurs.
+    The keys are read chunk_size at a time, each chunk is counted into its own HashMap by a pool of worker
+    processes (one per core by default), and the partial counts are merged by key as they come back.
+    Every process must hash a key the same way, so hash_function_builtin (which is randomized per process)
+    can't be used
+    """
+    if function is hash_function_builtin:
+        raise ValueError("hash_function_builtin differs between processes")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    counts = HashMap(16, function, max_load=1.0)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in _chunks(items, chunk_size):
+            # keeps at most two chunks per worker in flight, so a stream is never read far ahead of the counting
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counts.update(future.result(), add)
+            pending.add(pool.submit(_count_chunk, function, chunk))
+
+        # the partial counts share the hash function, so merging them reuses the workers' cached hashes
+        for future in pending:
+            counts.update(future.result(), add)
+
+    return counts
+
+
+def parallel_find_mode(items, workers: int = None, chunk_size: int = 100000) -> (DynamicArray, int):
+    """
+    Returns the same tuple of modes and frequency as find_mode (possibly with the modes in another order),
+    counting the keys across a pool of worker processes with count_parallel
+    """
+    counts = count_parallel(items, hash_function_1, workers, chunk_size)
 
-    # initializes the frequency of the mode and the array of modes
     mode_occurrence = 0
     mode_array = DynamicArray()
+    buckets_array = counts.get_buckets_array()
 
-    buckets_array = map.get_buckets_array()
-
-    # goes through each unique node in each bucket
+    # goes through each unique key, keeping the ones that occurred the most
     for bucket_index in range(buckets_array.length()):
-        bucket = buckets_array[bucket_index]
-        for node in bucket:
-
-            # if the key has occurred more in the initial array than any previous key
-            # updates the mode_occurrence and creates a new mode_array with just this key, eliminating the old
+        for node in buckets_array[bucket_index]:
             if node.value > mode_occurrence:
                 mode_occurrence = node.value
                 mode_array = DynamicArray()
                 mode_array.append(node.key)
-
-            # if the key has occurred the same as current mode, adds key to mode_array without eliminating the old
             elif node.value == mode_occurrence:
                 mode_array.append(node.key)
 
-            # if the key has occurred less than the current mode, nothing happens and moves to next key
+    return mode_array, mode_occurrence
+
 
-    tuple = (mode_array, mode_occurrence)
-    return tuple
+def find_mode(da) -> (DynamicArray, int):
+    """
+    Given an array (a DynamicArray, or any iterable of keys, which is read as a stream), returns a tuple with the
+    values that occur most in it, and the quantity of times they occur
+    """
+    # counts each element as it is read, which keeps the mode up to date along the way
+    counter = FrequencyCounter(hash_function_1)
+    counter.update(da)
+    return counter.mode()
 
 
 # ------------------- BASIC TESTING ---------------------------------------- #
@@ -444,3 +1206,34 @@ if __name__ == "__main__":
         map = HashMap(da.length() // 3, hash_function_2)
         mode, frequency = find_mode(da)
         print(f"Input: {da}\nMode: {mode}, Frequency: {frequency}\n")
+
+    print("\nfind_mode on a stream")
+    print("---------------------")
+    for case in ([], ["solo"]):
+        mode, frequency = find_mode(DynamicArray(case))
+        print(f"Input: {case}\nMode: {mode}, Frequency: {frequency}")
+    mode, frequency = find_mode(str(i % 7) for i in range(100000))
+    print(f"Mode: {mode}, Frequency: {frequency}")
+
+    print("\nparallel_find_mode")
+    print("------------------")
+    for case in test_cases:
+        mode, frequency = parallel_find_mode(DynamicArray(case), workers=2, chunk_size=4)
+        print(f"Input: {case}\nMode: {sorted(to_list(mode))}, Frequency: {frequency}")
+
+    print("\nFrequencyCounter top-k")
+    print("----------------------")
+    counter = FrequencyCounter(hash_function_2)
+    counter.update(("key" + str(i % 10) for i in range(1000) if i % 10 < 5 or i % 3 == 0), chunk_size=64)
+    print(counter.get_size(), counter.total(), counter.count("key3"), counter.count("missing"))
+    print(counter.most_common(7))
+
+    print("\ntreeified buckets")
+    print("-----------------")
+    m = HashMap(4, hash_function_1, treeify_threshold=4)
+    for key in ('key12', 'key21', 'kye12', 'yek21', 'eky12', 'key3'):
+        m.put(key, key.upper())
+    print(m)
+    for key in ('key21', 'kye12', 'eky12', 'yek21'):
+        m.remove(key)
+    print(m)
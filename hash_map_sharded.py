@@ -0,0 +1,305 @@
+# Description: A HashMap split across worker processes. Each shard process owns an open addressing or
+#              separate chaining HashMap, and the front end routes every key to its shard by hash.
+#              Operations are batched: a batch is split by shard, sent down every shard's pipe at once, and
+#              the replies are gathered afterwards, so the shards work on their parts side by side.
+#              The front end hashes each key once and sends the hash along, so the shards never hash again.
+
+
+import multiprocessing
+import os
+
+from a6_include import DynamicArray, HASH_MIX, MASK_64, hash_many, to_list, hash_function_builtin
+import hash_map_oa
+import hash_map_sc
+
+
+def _shard_main(connection, kind: str, capacity: int, function) -> None:
+    """
+    Runs in a shard process. Owns one HashMap, and answers the (operation, argument) messages that come
+    down the pipe until it is told to close. Each reply is ('ok', result) or ('error', exception)
+    """
+    if kind == 'oa':
+        map = hash_map_oa.HashMap(capacity, function)
+    else:
+        map = hash_map_sc.HashMap(capacity, function, max_load=1.0)
+
+    def lookup(key: str, hash_val: int) -> object:
+        """Returns the value of a key whose hash is known, or None."""
+        if kind == 'sc':
+            return map._get(key, hash_val)
+        value = map._lookup(key, hash_val)
+        return None if value is hash_map_oa._NOT_FOUND else value
+
+    while True:
+        operation, argument = connection.recv()
+        try:
+            if operation == 'put':
+                # argument is a list of (key, value, hash) triples
+                for key, value, hash_val in argument:
+                    map._put(key, value, hash_val)
+                result = None
+            elif operation == 'get':
+                # argument is a list of (key, hash) pairs
+                result = [lookup(key, hash_val) for key, hash_val in argument]
+            elif operation == 'remove':
+                for key, hash_val in argument:
+                    map._remove(key, hash_val)
+                result = None
+            elif operation == 'size':
+                result = map.get_size()
+            elif operation == 'items':
+                result = list(map.items())
+            elif operation == 'clear':
+                map.clear()
+                result = None
+            elif operation == 'close':
+                connection.send(('ok', None))
+                connection.close()
+                return
+            else:
+                raise ValueError("unknown operation " + str(operation))
+        except Exception as error:
+            connection.send(('error', error))
+        else:
+            connection.send(('ok', result))
+
+
+class ShardedHashMap:
+    def __init__(self, capacity: int, function, shards: int = None, kind: str = 'oa') -> None:
+        """
+        Initialize new ShardedHashMap, starting one process per shard (one per core by default), each owning
+        an open addressing (kind 'oa') or separate chaining (kind 'sc') HashMap with a share of the capacity.
+        Every process must hash a key the same way, so hash_function_builtin can't be used
+        """
+        if function is hash_function_builtin:
+            raise ValueError("hash_function_builtin differs between processes")
+        if kind not in ('oa', 'sc'):
+            raise ValueError("kind must be 'oa' or 'sc'")
+        if shards is None:
+            shards = os.cpu_count() or 1
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+
+        self._hash_function = function
+        self._shard_count = shards
+        self._connections = DynamicArray()
+        self._processes = DynamicArray()
+
+        for _ in range(shards):
+            parent_end, child_end = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_shard_main,
+                                              args=(child_end, kind, max(capacity // shards, 1), function),
+                                              daemon=True)
+            process.start()
+            child_end.close()
+            self._connections.append(parent_end)
+            self._processes.append(process)
+
+    def __enter__(self) -> "ShardedHashMap":
+        """Return the map, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop the shard processes at the end of a with statement."""
+        self.close()
+
+    def _shard_index(self, hash_val: int) -> int:
+        """
+        Returns the shard a hash belongs to, from the high bits of the scrambled hash
+        """
+        return (((hash_val * HASH_MIX) & MASK_64) * self._shard_count) >> 64
+
+    def _shard_for(self, key: str) -> (int, int):
+        """
+        Returns a tuple with the shard a key belongs to and the key's hash (kept to 64 bits)
+        """
+        hash_val = self._hash_function(key) & MASK_64
+        return self._shard_index(hash_val), hash_val
+
+    def _call(self, index: int, operation: str, argument) -> object:
+        """
+        Sends an operation to one shard and returns its result. Raises the error the shard reports, if any
+        """
+        connection = self._connections[index]
+        connection.send((operation, argument))
+        status, result = connection.recv()
+        if status == 'error':
+            raise result
+        return result
+
+    def _call_all(self, operation: str, arguments) -> list:
+        """
+        Sends an operation to every shard (with that shard's argument, if arguments is a list, or None),
+        then gathers every shard's result. A shard whose argument is an empty list has nothing to do,
+        so it isn't sent anything and its result is None. Raises the first error a shard reports
+        """
+        sent = [arguments is None or len(arguments[index]) > 0 for index in range(self._shard_count)]
+        for index in range(self._shard_count):
+            if sent[index]:
+                argument = arguments[index] if arguments is not None else None
+                self._connections[index].send((operation, argument))
+
+        # every reply is read before raising, so that no reply is left behind in a pipe
+        results = []
+        error = None
+        for index in range(self._shard_count):
+            if not sent[index]:
+                results.append(None)
+                continue
+
+            status, result = self._connections[index].recv()
+            if status == 'error' and error is None:
+                error = result
+            results.append(result)
+
+        if error is not None:
+            raise error
+        return results
+
+    def _split(self, keys: list) -> (list, list):
+        """
+        Hashes the keys in one batch, and returns a list of (key, hash) pairs for each shard, and for each shard
+        the positions its keys had in keys
+        """
+        hashes = hash_many(self._hash_function, keys)
+        parts = [[] for _ in range(self._shard_count)]
+        positions = [[] for _ in range(self._shard_count)]
+
+        # the hashes are kept to 64 bits, the form both kinds of shard map can take them in
+        for position in range(len(keys)):
+            hash_val = hashes[position] & MASK_64
+            index = self._shard_index(hash_val)
+            parts[index].append((keys[position], hash_val))
+            positions[index].append(position)
+
+        return parts, positions
+
+    def put_many(self, pairs) -> None:
+        """
+        Returns nothing. Adds (or updates) every (key, value) pair of an iterable or DynamicArray of pairs
+        """
+        pairs = to_list(pairs)
+        parts, positions = self._split([pair[0] for pair in pairs])
+
+        triples = [[(key, pairs[position][1], hash_val)
+                    for (key, hash_val), position in zip(parts[index], positions[index])]
+                   for index in range(self._shard_count)]
+        self._call_all('put', triples)
+
+    def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a DynamicArray with the value of each key of an iterable or DynamicArray of keys, in order
+        (None for keys that are not in the hash map)
+        """
+        keys = to_list(keys)
+        parts, positions = self._split(keys)
+        results = self._call_all('get', parts)
+
+        # puts each shard's values back in the order the keys were asked for
+        values = [None] * len(keys)
+        for index in range(self._shard_count):
+            if results[index] is None:
+                continue
+            for position, value in zip(positions[index], results[index]):
+                values[position] = value
+        return DynamicArray(values)
+
+    def remove_many(self, keys) -> None:
+        """
+        Returns nothing. Removes every key of an iterable or DynamicArray of keys
+        """
+        parts, _ = self._split(to_list(keys))
+        self._call_all('remove', parts)
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Returns nothing. Adds a key with a value to the hash map, or updates the key if it already exists
+        """
+        index, hash_val = self._shard_for(key)
+        self._call(index, 'put', [(key, value, hash_val)])
+
+    def get(self, key: str) -> object:
+        """
+        Given a key, returns the value of that key if it is in the hash map. Otherwise, returns None
+        """
+        index, hash_val = self._shard_for(key)
+        return self._call(index, 'get', [(key, hash_val)])[0]
+
+    def remove(self, key: str) -> None:
+        """
+        Returns nothing. Given a key, removes it from the hash map if it is there
+        """
+        index, hash_val = self._shard_for(key)
+        self._call(index, 'remove', [(key, hash_val)])
+
+    def get_size(self) -> int:
+        """
+        Returns the number of keys in all the shards
+        """
+        return sum(self._call_all('size', None))
+
+    def items(self):
+        """
+        Returns a generator over the (key, value) pairs of all the shards
+        """
+        for pairs in self._call_all('items', None):
+            yield from pairs
+
+    def get_keys(self) -> DynamicArray:
+        """
+        Returns a DynamicArray created of all the keys in the hash map
+        """
+        return DynamicArray([pair[0] for pair in self.items()])
+
+    def clear(self) -> None:
+        """
+        Returns nothing. Clears every shard
+        """
+        self._call_all('clear', None)
+
+    def close(self) -> None:
+        """
+        Returns nothing. Stops the shard processes. The map can't be used afterwards
+        """
+        if self._processes.length() == 0:
+            return
+
+        self._call_all('close', None)
+        for index in range(self._shard_count):
+            self._processes[index].join()
+            self._connections[index].close()
+        self._processes = DynamicArray()
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+    import time
+
+    from a6_include import hash_function_fnv1a
+
+    print("\nShardedHashMap basics")
+    print("---------------------")
+    for kind in ('oa', 'sc'):
+        with ShardedHashMap(16, hash_function_fnv1a, shards=3, kind=kind) as m:
+            m.put_many(('key' + str(i), i) for i in range(1000))
+            m.remove_many('key' + str(i) for i in range(0, 1000, 2))
+            m.put('none', None)
+            values = m.get_many(['key1', 'key2', 'none', 'missing'])
+            print(kind, m.get_size(), values, m.get('key999'), sorted(to_list(m.get_keys()))[:3])
+
+    print("\nthroughput")
+    print("----------")
+    keys = ['key' + str(i) for i in range(200000)]
+    for shards in sorted({1, 2, os.cpu_count() or 1}):
+        with ShardedHashMap(16, hash_function_fnv1a, shards=shards) as m:
+            start = time.perf_counter()
+            for batch in range(0, len(keys), 20000):
+                m.put_many((key, key) for key in keys[batch:batch + 20000])
+            put_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for batch in range(0, len(keys), 20000):
+                m.get_many(keys[batch:batch + 20000])
+            get_time = time.perf_counter() - start
+            print(f"{shards} shards: put {len(keys) / put_time:,.0f} keys/s, get {len(keys) / get_time:,.0f} keys/s")
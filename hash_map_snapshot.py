@@ -0,0 +1,396 @@
+# Description: Binary snapshots of the open addressing HashMap.
+#              save_snapshot writes the table's slot layout (hashes, states, keys and values) to a file, so that
+#              load_snapshot can rebuild the map slot for slot without hashing or probing for a single key,
+#              and MappedHashMap can memory-map the file and answer lookups straight from it.
+#
+#              File layout (native byte order):
+#              header | metadata (probing and hash function names, hash function fingerprint, capacity policy)
+#              | hashes (8 bytes per slot)
+#              | record offsets (8 bytes per slot) | states (1 byte per slot) | records
+#              where each live slot's record is its UTF-8 key and its tagged value.
+#
+#              Values that are not None, bool, int, float, str or bytes are pickled,
+#              so only load snapshots that came from a trusted source.
+
+
+import mmap
+import pickle
+import struct
+from array import array
+
+from a6_include import HashEntry, hash_function_builtin
+from hash_map_oa import (EMPTY, LIVE, TOMBSTONE, HASH_MASK, HashMap, SlotTable, LinearProbing, QuadraticProbing,
+                         DoubleHashing, RobinHoodProbing)
+
+
+MAGIC = b'HMAPSNAP'
+VERSION = 3
+
+# magic, version, metadata length, capacity, size, tombstones, records length
+HEADER = struct.Struct('=8sIIQQQQ')
+KEY_LENGTH = struct.Struct('=I')
+VALUE_HEADER = struct.Struct('=BI')
+INT_VALUE = struct.Struct('=q')
+FLOAT_VALUE = struct.Struct('=d')
+
+# tags of the value types kept in a record
+TAG_NONE = 0
+TAG_TRUE = 1
+TAG_FALSE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STR = 5
+TAG_BYTES = 6
+TAG_PICKLE = 7
+
+# key whose hash is saved as the hash function's fingerprint, so that a function recorded under the same name
+# but hashing differently (like a KeyedHashFunction with another seed) is caught when the snapshot is loaded
+FINGERPRINT_KEY = 'HashMap snapshot fingerprint'
+
+PROBING_STRATEGIES = {strategy.__name__: strategy
+                      for strategy in (LinearProbing, QuadraticProbing, DoubleHashing, RobinHoodProbing)}
+
+
+def _function_name(function) -> str:
+    """
+    Returns the name a hash function is recorded under. A callable object (like a KeyedHashFunction) is recorded
+    by its class, so its seed is never written to the file (only the hash of FINGERPRINT_KEY is)
+    """
+    name = getattr(function, '__qualname__', None) or type(function).__qualname__
+    return getattr(function, '__module__', type(function).__module__) + '.' + name
+
+
+def _encode_value(value: object) -> bytes:
+    """
+    Returns the tag and length header followed by the bytes of a value
+    """
+    if value is None:
+        tag, data = TAG_NONE, b''
+    elif value is True:
+        tag, data = TAG_TRUE, b''
+    elif value is False:
+        tag, data = TAG_FALSE, b''
+    elif type(value) is int and -(1 << 63) <= value < (1 << 63):
+        tag, data = TAG_INT, INT_VALUE.pack(value)
+    elif type(value) is float:
+        tag, data = TAG_FLOAT, FLOAT_VALUE.pack(value)
+    elif type(value) is str:
+        tag, data = TAG_STR, value.encode()
+    elif type(value) is bytes:
+        tag, data = TAG_BYTES, value
+    else:
+        tag, data = TAG_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    return VALUE_HEADER.pack(tag, len(data)) + data
+
+
+def _decode_value(buffer, offset: int) -> object:
+    """
+    Returns the value whose tagged record starts at offset in the buffer
+    """
+    tag, length = VALUE_HEADER.unpack_from(buffer, offset)
+    start = offset + VALUE_HEADER.size
+    data = bytes(buffer[start:start + length])
+
+    if tag == TAG_NONE:
+        return None
+    if tag == TAG_TRUE:
+        return True
+    if tag == TAG_FALSE:
+        return False
+    if tag == TAG_INT:
+        return INT_VALUE.unpack(data)[0]
+    if tag == TAG_FLOAT:
+        return FLOAT_VALUE.unpack(data)[0]
+    if tag == TAG_STR:
+        return data.decode()
+    if tag == TAG_BYTES:
+        return data
+    return pickle.loads(data)
+
+
+def save_snapshot(map: HashMap, path: str) -> None:
+    """
+    Returns nothing. Writes the slot layout of an open addressing HashMap to a file.
+    Any incremental resize is finished first, so the file holds a single table
+    """
+    if map._hash_function is hash_function_builtin:
+        raise ValueError("hash_function_builtin differs between processes, so its hashes can't be saved")
+
+    map._finish_resize()
+    table = map._buckets
+    capacity = map._capacity
+
+    hashes = array('Q', bytes(8 * capacity))
+    offsets = array('Q', bytes(8 * capacity))
+    states = bytearray(capacity)
+    records = bytearray()
+
+    # only live slots get a record, a tombstone is kept as its state alone
+    for index in range(capacity):
+        state = table.state(index)
+        states[index] = state
+        if state == LIVE:
+            hashes[index] = table.hash_at(index)
+            offsets[index] = len(records)
+            key = table.key_at(index).encode()
+            records += KEY_LENGTH.pack(len(key)) + key + _encode_value(table.value_at(index))
+
+    # a capacity policy of None is recorded as an empty line
+    metadata = '\n'.join((type(map._probing).__name__, _function_name(map._hash_function),
+                          str(map._hash(FINGERPRINT_KEY)), map._capacity_policy or '')).encode()
+    # pads the metadata so that the hash and offset arrays start on an 8 byte boundary
+    metadata += bytes(-len(metadata) % 8)
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(metadata), capacity, map._size, map._tombstones, len(records)))
+        file.write(metadata)
+        file.write(hashes.tobytes())
+        file.write(offsets.tobytes())
+        file.write(states)
+        file.write(records)
+
+
+def _read_layout(buffer, function, probing):
+    """
+    Checks a snapshot's header against the hash function, and returns a tuple with the probing strategy,
+    the capacity policy, the capacity, size and tombstone count, and the offsets of the hash, offset, state
+    and record sections
+    """
+    if len(buffer) < HEADER.size:
+        raise ValueError("not a HashMap snapshot")
+    magic, version, metadata_length, capacity, size, tombstones, records_length = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a HashMap snapshot, or one of another version")
+
+    start = HEADER.size
+    probing_name, function_name, fingerprint, capacity_policy = \
+        bytes(buffer[start:start + metadata_length]).rstrip(b'\0').decode().split('\n')
+    capacity_policy = capacity_policy or None
+
+    # the saved hashes are only valid for the hash function they were made with
+    if function_name != _function_name(function):
+        raise ValueError("snapshot was saved with hash function " + function_name)
+    if int(fingerprint) != function(FINGERPRINT_KEY) & HASH_MASK:
+        raise ValueError("snapshot was saved with a hash function " + function_name + " that hashes keys differently")
+
+    # a custom strategy can't be rebuilt from its name, so it has to be passed in
+    if probing is None:
+        if probing_name not in PROBING_STRATEGIES:
+            raise ValueError("snapshot uses probing strategy " + probing_name + ", pass it as probing")
+        probing = PROBING_STRATEGIES[probing_name]()
+
+    hashes_start = start + metadata_length
+    offsets_start = hashes_start + 8 * capacity
+    states_start = offsets_start + 8 * capacity
+    records_start = states_start + capacity
+    if len(buffer) < records_start + records_length:
+        raise ValueError("snapshot is truncated")
+    return (probing, capacity_policy, capacity, size, tombstones, hashes_start, offsets_start, states_start,
+            records_start)
+
+
+def load_snapshot(path: str, function, compact: bool = False, probing=None, stats: bool = False) -> HashMap:
+    """
+    Returns a new HashMap with the contents of a snapshot. Each key is stored back in the slot it was saved from,
+    with its saved hash, so nothing is hashed or probed. function must be the hash function the map was saved with
+    """
+    with open(path, 'rb') as file:
+        buffer = memoryview(file.read())
+
+    (probing, capacity_policy, capacity, size, tombstones, hashes_start, offsets_start, states_start,
+     records_start) = _read_layout(buffer, function, probing)
+    hashes = buffer[hashes_start:offsets_start].cast('Q')
+    offsets = buffer[offsets_start:states_start].cast('Q')
+
+    map = HashMap(capacity, function, compact=compact, probing=probing, stats=stats,
+                  capacity_policy=capacity_policy)
+    table = map._buckets
+
+    for index in range(capacity):
+        state = buffer[states_start + index]
+        if state == LIVE:
+            offset = records_start + offsets[index]
+            (key_length,) = KEY_LENGTH.unpack_from(buffer, offset)
+            key_start = offset + KEY_LENGTH.size
+            key = bytes(buffer[key_start:key_start + key_length]).decode()
+            table.store(index, key, _decode_value(buffer, key_start + key_length), hashes[index])
+        elif state == TOMBSTONE:
+            table.store(index, None, None, 0)
+            table.make_tombstone(index)
+
+    map._size = size
+    map._tombstones = tombstones
+    return map
+
+
+class MappedTable(SlotTable):
+    """
+    Read-only table that reads its slots straight from a memory-mapped snapshot.
+    Keys and values are only decoded when a lookup reaches them
+    """
+
+    def __init__(self, buffer, capacity: int, hashes_start: int, offsets_start: int, states_start: int,
+                 records_start: int) -> None:
+        """Initialize the table over the sections of a snapshot's buffer."""
+        self._buffer = buffer
+        self._capacity = capacity
+        self._hashes = buffer[hashes_start:offsets_start].cast('Q')
+        self._offsets = buffer[offsets_start:states_start].cast('Q')
+        self._states = buffer[states_start:records_start]
+        self._records_start = records_start
+
+    def release(self) -> None:
+        """Let go of the views into the buffer, so that the memory map can be closed."""
+        self._hashes.release()
+        self._offsets.release()
+        self._states.release()
+
+    def __getitem__(self, index: int) -> HashEntry:
+        """Return a HashEntry copy of the given slot, or None if the slot is empty."""
+        state = self._states[index]
+        if state == EMPTY:
+            return None
+        if state == TOMBSTONE:
+            entry = HashEntry(None, None, 0)
+            entry.is_tombstone = True
+            return entry
+        return HashEntry(self.key_at(index), self.value_at(index), self._hashes[index])
+
+    def length(self) -> int:
+        """Return the number of slots in the table."""
+        return self._capacity
+
+    def state(self, index: int) -> int:
+        """Return whether the slot is EMPTY, LIVE or a TOMBSTONE."""
+        return self._states[index]
+
+    def hash_at(self, index: int) -> int:
+        """Return the cached hash of the key in a live slot."""
+        return self._hashes[index]
+
+    def key_at(self, index: int) -> str:
+        """Return the key in a live slot."""
+        offset = self._records_start + self._offsets[index]
+        (key_length,) = KEY_LENGTH.unpack_from(self._buffer, offset)
+        key_start = offset + KEY_LENGTH.size
+        return bytes(self._buffer[key_start:key_start + key_length]).decode()
+
+    def value_at(self, index: int) -> object:
+        """Return the value in a live slot."""
+        offset = self._records_start + self._offsets[index]
+        (key_length,) = KEY_LENGTH.unpack_from(self._buffer, offset)
+        return _decode_value(self._buffer, offset + KEY_LENGTH.size + key_length)
+
+
+class MappedHashMap(HashMap):
+    """
+    Read-only open addressing HashMap served straight from a memory-mapped snapshot.
+    Opening it only reads the header, and the operating system pages the rest of the file in as lookups touch it.
+    get, contains_key, get_many, keys, values, items and merge work as on a HashMap,
+    anything that would change the map raises a TypeError
+    """
+
+    def __init__(self, path: str, function, probing=None, stats: bool = False) -> None:
+        """
+        Initialize the map over a snapshot file. function must be the hash function the map was saved with
+        """
+        self._file = open(path, 'rb')
+        try:
+            # an empty file can't be mapped, so the file is closed here if the mapping fails
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+
+        try:
+            (probing, capacity_policy, capacity, size, tombstones, hashes_start, offsets_start, states_start,
+             records_start) = _read_layout(self._view, function, probing)
+        except Exception:
+            self.close()
+            raise
+
+        super().__init__(1, function, probing=probing, stats=stats, capacity_policy=capacity_policy)
+        self._buckets = MappedTable(self._view, capacity, hashes_start, offsets_start, states_start, records_start)
+        self._capacity = capacity
+        self._size = size
+        self._tombstones = tombstones
+
+    def close(self) -> None:
+        """
+        Returns nothing. Unmaps the snapshot. The map can't be used afterwards
+        """
+        if isinstance(getattr(self, '_buckets', None), MappedTable):
+            self._buckets.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "MappedHashMap":
+        """Return the map, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the map at the end of a with statement."""
+        self.close()
+
+    def _read_only(self, *args) -> None:
+        """
+        Raises a TypeError, since a memory-mapped map can't be changed
+        """
+        raise TypeError("a MappedHashMap is read-only, load_snapshot it to get a map that can be changed")
+
+    _put = _read_only
+    _remove = _read_only
+    _start_resize = _read_only
+    resize_table = _read_only
+    clear = _read_only
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+
+    from a6_include import hash_function_fnv1a
+
+    print("\nsave_snapshot / load_snapshot / MappedHashMap")
+    print("---------------------------------------------")
+    m = HashMap(16, hash_function_fnv1a)
+    for i in range(100000):
+        m.put('key' + str(i), i if i % 5 else ('value' + str(i), i))
+    for i in range(0, 100000, 7):
+        m.remove('key' + str(i))
+    m.put('none', None)
+    m.put('float', 1.5)
+    m.put('bytes', b'\x00\x01')
+
+    path = os.path.join(tempfile.mkdtemp(), 'map.snapshot')
+    save_snapshot(m, path)
+    print(os.path.getsize(path), 'bytes')
+
+    start = time.perf_counter()
+    loaded = load_snapshot(path, hash_function_fnv1a, compact=True)
+    print(f"load_snapshot: {time.perf_counter() - start:.3f}s", loaded.get_size(), loaded.get_capacity(),
+          loaded.get_tombstones())
+
+    start = time.perf_counter()
+    with MappedHashMap(path, hash_function_fnv1a) as mapped:
+        print(f"MappedHashMap: {time.perf_counter() - start:.6f}s", mapped.get_size(), mapped.get_capacity())
+
+        result = True
+        for i in range(0, 100000, 3):
+            key = 'key' + str(i)
+            result &= loaded.get(key) == m.get(key) == mapped.get(key)
+            result &= loaded.contains_key(key) == m.contains_key(key) == mapped.contains_key(key)
+        for key in ('none', 'float', 'bytes', 'missing'):
+            result &= loaded.get(key) == m.get(key) == mapped.get(key)
+        print(result, mapped.contains_key('none'), mapped.contains_key('missing'))
+
+        try:
+            mapped.put('key1', 1)
+        except TypeError as error:
+            print(error)